@@ -3,7 +3,7 @@ from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
-from routes import forum_routes, auth_routes, blog_routes, shop_routes, admin_routes, profile_routes, consultant_routes
+from routes import forum_routes, auth_routes, blog_routes, shop_routes, admin_routes, profile_routes, consultant_routes, media_routes, asset_routes
 from models.user_model import User
 from models import db
 from config import Config
@@ -52,10 +52,51 @@ def create_app():
     def load_user(user_id):
         return User.query.get(int(user_id))
 
+    # Background thumbnail/WebP generation for product images
+    from utils import image_pipeline
+    image_pipeline.init_app(app)
+
+    # Template helpers for the built static image ladders
+    from utils import assets
+    assets.init_app(app)
+
+    # ETag/Last-Modified validators for public catalog, blog and forum pages
+    from utils import conditional
+    conditional.init_app(app)
+
+    # {% cache %} tag for per-item markup on listing pages
+    from utils import fragment_cache
+    fragment_cache.init_app(app)
+
+    # Periodic jobs, started with the first request; the reservation sweeper is one
+    from utils import background, reservations
+    background.init_app(app)
+    reservations.init_app(app)
+
+    # Session cart, written behind to the Cart table
+    from utils import cart
+    cart.init_app(app)
+
+    # Outgoing mail is queued in email_outbox and sent by a background job
+    from utils import email_utils
+    email_utils.init_app(app)
+
+    # Admin dashboard counts, recomputed by a background job
+    from utils import dashboard
+    dashboard.init_app(app)
+
     # Create database tables
     with app.app_context():
+        # WAL + busy_timeout so concurrent writers wait instead of failing
+        from utils import sqlite_tuning
+        sqlite_tuning.init_app(app)
+
         db.create_all()
 
+        # Full-text product search index (falls back to LIKE without FTS5)
+        from utils import search
+        search.init_app(app)
+
         # Ensure `is_active` column exists on users table (backwards-compatibility)
         from sqlalchemy import text
         try:
@@ -106,6 +147,8 @@ def create_app():
     app.register_blueprint(admin_routes.bp)
     app.register_blueprint(profile_routes.bp)
     app.register_blueprint(consultant_routes.bp)
+    app.register_blueprint(media_routes.bp)
+    app.register_blueprint(asset_routes.bp)
     
     @app.context_processor
     def inject_now():
@@ -122,6 +165,8 @@ def create_app():
         # Skip static, favicon, and auth routes, profile routes themselves, and public blueprints
         public_allowed = (
             'static',
+            'media.',
+            'assets.',
             'favicon',
             'home',
             'auth.',
@@ -33,6 +33,41 @@ class Config:
     SECRET_KEY = 'your-secret-key-here'
     UPLOAD_FOLDER = os.path.join('static', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+    # Content-addressed product media (see utils/blob_store.py)
+    MEDIA_ROOT = os.path.join(basedir, 'instance', 'media')
+    IMAGE_WORKERS = 2  # threads building image derivatives; 0 builds inline
+    # {% cache %} fragments (see utils/fragment_cache.py): 'lru', 'disk' or 'null'
+    FRAGMENT_CACHE_TYPE = 'lru'
+    FRAGMENT_CACHE_SIZE = 2048
+    FRAGMENT_CACHE_DIR = os.path.join(basedir, 'instance', 'fragment_cache')
+    FRAGMENT_CACHE_TTL = 3600
+    # SQLite under several workers (see utils/sqlite_tuning.py)
+    SQLITE_WAL = True
+    SQLITE_BUSY_TIMEOUT = 15000  # ms a writer waits for the lock
+
+    RESERVATION_TTL = 900  # seconds an add-to-cart holds stock
+    RESERVATION_SWEEP_INTERVAL = 60  # seconds between expiry sweeps; 0 disables
+    RESERVATION_SWEEP_BATCH = 500
+    CART_FLUSH_INTERVAL = 30  # seconds between write-behind saves of a session cart
+    CART_SUMMARY_TTL = 60  # seconds a cached mini-cart summary lives (prices can change)
+    DASHBOARD_REFRESH_INTERVAL = 60  # seconds between admin dashboard snapshot rebuilds; 0 disables
+    DASHBOARD_SNAPSHOT_TTL = 300  # seconds a snapshot is served if the refresh job stops
+    LOW_STOCK_COUNT_TTL = 300  # seconds the low-stock count is cached between threshold crossings
+    # Outgoing mail (see utils/email_utils.py): 'smtp', 'file' or None to disable
+    MAIL_SERVER = os.environ.get('MAIL_SERVER')
+    MAIL_BACKEND = os.environ.get('MAIL_BACKEND') or ('smtp' if MAIL_SERVER else None)
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
+    MAIL_USE_SSL = os.environ.get('MAIL_USE_SSL', 'false').lower() in ('1', 'true', 'yes')
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'AgriSphere <no-reply@agrisphere.local>')
+    MAIL_FILE_DIR = os.path.join(basedir, 'instance', 'mail')
+    MAIL_SEND_INTERVAL = 10  # seconds between outbox drains
+    MAIL_BATCH_SIZE = 50
+    MAIL_MAX_ATTEMPTS = 6
+    MAIL_RETRY_BACKOFF = 60  # seconds before the first retry, doubled each time
+    MAIL_RETRY_BACKOFF_MAX = 3600
 
 # ✅ ADD ENVIRONMENT CONFIGS HERE
 class DevelopmentConfig(Config):
@@ -46,4 +81,10 @@ class ProductionConfig(Config):
 
 class TestingConfig(Config):
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
\ No newline at end of file
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    IMAGE_WORKERS = 0
+    FRAGMENT_CACHE_TYPE = 'null'
+    RESERVATION_SWEEP_INTERVAL = 0
+    MAIL_BACKEND = 'file'
+    MAIL_SEND_INTERVAL = 0
+    DASHBOARD_REFRESH_INTERVAL = 0
\ No newline at end of file
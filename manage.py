@@ -1,3 +1,4 @@
+import click
 from flask.cli import FlaskGroup
 from app import create_app, db
 
@@ -9,5 +10,241 @@ def create_db():
     db.create_all()
     db.session.commit()
 
+@cli.command("reconcile-stats")
+@click.option("--dry-run", is_flag=True, help="Report drift without fixing it.")
+def reconcile_stats(dry_run):
+    """Backfill/repair product rating and sales counters."""
+    from utils import product_stats
+    drift = product_stats.reconcile(fix=not dry_run)
+    for product_id, field, stored, actual in drift:
+        click.echo(f"product {product_id}: {field} {stored} -> {actual}")
+    verb = "found" if dry_run else "fixed"
+    click.echo(f"{len(drift)} counter(s) {verb}.")
+
+@cli.command("rebuild-search")
+def rebuild_search():
+    """Rebuild the full-text product search index."""
+    from utils import search
+    if not search.is_available():
+        click.echo("SQLite FTS5 is not available; search uses LIKE.")
+        return
+    click.echo(f"Indexed {search.rebuild()} product(s).")
+
+@cli.command("build-derivatives")
+def build_derivatives():
+    """Build missing thumbnail/WebP variants for every product image."""
+    from flask import current_app
+    from models import ProductImage
+    from utils import image_pipeline
+    media_root = current_app.config['MEDIA_ROOT']
+    keys = {row[0] for row in db.session.query(ProductImage.blob_key).filter(ProductImage.blob_key.isnot(None))}
+    written = 0
+    for key in sorted(keys):
+        try:
+            written += image_pipeline.generate(media_root, key)
+        except Exception as e:
+            click.echo(f"{key}: {e}")
+    click.echo(f"Wrote {written} derivative(s) for {len(keys)} image(s).")
+
+@cli.command("build-assets")
+def build_assets():
+    """Build image ladders, then fingerprint and precompress all static files."""
+    from flask import current_app
+    from utils import assets
+    manifest = assets.build_images(current_app.static_folder, log=click.echo)
+    click.echo(f"Built {len(manifest)} image(s).")
+    assets.build_static(current_app.static_folder, log=click.echo)
+
+@cli.command("rebuild-sales")
+def rebuild_sales():
+    """Recompute the sales_daily rollup from all orders."""
+    from utils import sales_rollup
+    click.echo(f"Wrote {sales_rollup.rebuild()} rollup row(s).")
+
+@cli.command("inventory-snapshot")
+def inventory_snapshot():
+    """Write today's per-product stock snapshot (run daily)."""
+    from utils import inventory
+    click.echo(f"Wrote {inventory.take_snapshots()} snapshot(s).")
+
+@cli.command("low-stock-digest")
+def low_stock_digest():
+    """Queue low-stock mails for vendors and admins (run daily)."""
+    from utils import low_stock
+    click.echo(f"Queued {low_stock.queue_digest()} low-stock mail(s).")
+
+@cli.command("reconcile-inventory")
+@click.option("--fix", is_flag=True, help="Append adjustment entries so the ledger matches stock.")
+def reconcile_inventory(fix):
+    """Compare product stock with the inventory ledger."""
+    from utils import inventory
+    drift = inventory.reconcile(fix=fix)
+    for product_id, ledger, stored in drift:
+        click.echo(f"product {product_id}: ledger {ledger}, stock {stored}")
+    verb = "fixed" if fix else "found"
+    click.echo(f"{len(drift)} mismatch(es) {verb}.")
+
+@cli.command("send-email")
+def send_email():
+    """Drain the email outbox now instead of waiting for the worker."""
+    from utils import email_utils
+    if not email_utils.is_configured():
+        click.echo("No mail backend configured (MAIL_BACKEND).")
+        return
+    sent, retried, dead = email_utils.send_pending()
+    click.echo(f"{sent} sent, {retried} to retry, {dead} dead-lettered.")
+
+@cli.command("requeue-email")
+def requeue_email():
+    """Retry dead-lettered outbox messages from scratch."""
+    from utils import email_utils
+    click.echo(f"Requeued {email_utils.requeue_dead()} message(s).")
+
+@cli.command("export")
+@click.argument("name", type=click.Choice(["orders", "products", "users"]))
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default="csv", show_default=True)
+@click.option("--since", help="Only rows updated (users: created) on/after this date or ISO time.")
+@click.option("--until", help="Only rows before this date or ISO time.")
+@click.option("--status", help="Order status, or active/disabled for products.")
+@click.option("--q", help="Same search as the admin list view.")
+@click.option("--category", help="Product category name.")
+@click.option("--role", help="User role.")
+@click.option("--output", "-o", type=click.File("w"), default="-", help="File to write (default stdout).")
+def export(name, fmt, since, until, status, q, category, role, output):
+    """Stream a table as CSV or NDJSON (e.g. nightly: --since "$(date -d yesterday +%F)")."""
+    from utils import exports
+    try:
+        since = exports.parse_date(since)
+        until = exports.parse_date(until)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    filters = {"status": status, "q": q, "category": category, "role": role}
+    for chunk in exports.stream(name, fmt, filters=filters, since=since, until=until):
+        output.write(chunk)
+
+@cli.command("index-advisor")
+@click.option("--user", "email", help="Request pages as this user (default: the first admin).")
+@click.option("--min-rows", default=0, show_default=True, help="Ignore scans of tables with fewer rows.")
+@click.option("--sql", "show_sql", is_flag=True, help="Print each flagged statement.")
+def index_advisor(email, min_rows, show_sql):
+    """Visit every GET page and flag queries whose plan scans a whole table."""
+    from models import User
+    from utils import index_advisor
+    user_id = None
+    if email:
+        user_id = db.session.query(User.id).filter_by(email=email).scalar()
+        if user_id is None:
+            raise click.BadParameter(f"no user {email}", param_hint="--user")
+    try:
+        report = index_advisor.run(user_id)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    shown = [f for f in report.findings if f.rows is None or f.rows >= min_rows]
+    for f in shown:
+        where = f"{f.table} ({f.rows} rows)" if f.table else "sort"
+        click.echo(f"{where}: {f.detail}")
+        click.echo(f"  from {', '.join(f.endpoints)}")
+        if show_sql:
+            click.echo(f"  {' '.join(f.statement.split())}")
+    for endpoint in report.skipped:
+        click.echo(f"skipped {endpoint}: no sample value for its URL arguments")
+    for endpoint, error in report.failed:
+        click.echo(f"failed {endpoint}: {error}")
+    click.echo(f"{len(report.visited)} page(s), {report.statements} statement(s), {len(shown)} finding(s).")
+
+@cli.command("bench-checkout")
+@click.option("--concurrency", default=50, show_default=True, help="Simultaneous checkouts.")
+@click.option("--stock", type=int, help="Units in stock (default: half the buyers).")
+@click.option("--keep", is_flag=True, help="Keep the benchmark users, product and orders.")
+def bench_checkout(concurrency, stock, keep):
+    """Race CONCURRENCY buyers for one product and check nothing oversells.
+
+    Creates throwaway users and a product in the configured database and
+    removes them afterwards unless --keep is given.
+    """
+    import threading
+    import time
+    import uuid
+    from flask import current_app
+    from sqlalchemy.exc import OperationalError
+    from werkzeug.security import generate_password_hash
+    from models import User, Product, Cart, Order, OrderItem, Payment, InventoryLog
+    from utils import inventory, orders, sales_rollup
+
+    app = current_app._get_current_object()
+    stock = concurrency // 2 if stock is None else stock
+    tag = uuid.uuid4().hex[:8]
+    password = generate_password_hash(tag)
+    buyers = [User(name=f"bench {i}", email=f"bench-{tag}-{i}@example.invalid", password=password)
+              for i in range(concurrency)]
+    db.session.add_all(buyers)
+    db.session.flush()
+    product = Product(name=f"bench {tag}", price=1.0, img_url="", quantity=stock, in_stock=stock > 0,
+                      vendor_id=buyers[0].id)
+    db.session.add(product)
+    db.session.flush()
+    inventory.record_initial(product, buyers[0].id)
+    db.session.add_all([Cart(user_id=u.id, product_id=product.id, quantity=1) for u in buyers])
+    db.session.commit()
+    buyer_ids = [u.id for u in buyers]
+    product_id = product.id
+
+    results = []
+    results_lock = threading.Lock()
+    barrier = threading.Barrier(concurrency)
+
+    def buy(user_id):
+        with app.app_context():
+            barrier.wait()
+            start = time.perf_counter()
+            try:
+                orders.place_order(user_id, "benchmark")
+                outcome = "ok"
+            except orders.OutOfStock:
+                outcome = "out_of_stock"
+            except OperationalError:
+                outcome = "busy"
+            finally:
+                db.session.remove()
+            with results_lock:
+                results.append((outcome, time.perf_counter() - start))
+
+    threads = [threading.Thread(target=buy, args=(uid,)) for uid in buyer_ids]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    db.session.expire_all()
+    remaining = db.session.get(Product, product_id).quantity
+    ordered = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)).filter(
+        OrderItem.product_id == product_id).scalar()
+    latencies = sorted(t for _, t in results)
+    counts = {k: sum(1 for o, _ in results if o == k) for k in ("ok", "out_of_stock", "busy")}
+    click.echo(f"{concurrency} checkouts in {elapsed:.2f}s ({concurrency / elapsed:.1f}/s)")
+    click.echo(f"  placed {counts['ok']}, out of stock {counts['out_of_stock']}, busy {counts['busy']}")
+    click.echo(f"  latency p50 {latencies[len(latencies) // 2] * 1000:.0f}ms, "
+               f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f}ms, max {latencies[-1] * 1000:.0f}ms")
+    consistent = remaining >= 0 and ordered == counts["ok"] and stock - remaining == ordered
+    click.echo(f"  stock {stock} -> {remaining}, units ordered {ordered}: {'consistent' if consistent else 'OVERSOLD'}")
+
+    if not keep:
+        placed = Order.query.filter(Order.user_id.in_(buyer_ids)).all()
+        for order in placed:
+            sales_rollup.remove_order(order)
+        order_ids = [o.id for o in placed]
+        OrderItem.query.filter(OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+        Payment.query.filter(Payment.order_id.in_(order_ids)).delete(synchronize_session=False)
+        Order.query.filter(Order.id.in_(order_ids)).delete(synchronize_session=False)
+        Cart.query.filter(Cart.user_id.in_(buyer_ids)).delete(synchronize_session=False)
+        InventoryLog.query.filter(InventoryLog.product_id == product_id).delete(synchronize_session=False)
+        db.session.delete(db.session.get(Product, product_id))
+        User.query.filter(User.id.in_(buyer_ids)).delete(synchronize_session=False)
+        db.session.commit()
+    if not consistent:
+        raise SystemExit(1)
+
 if __name__ == "__main__":
     cli()
\ No newline at end of file
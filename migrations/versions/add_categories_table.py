@@ -0,0 +1,58 @@
+"""Move product categories into their own table
+
+Revision ID: add_categories_004
+Revises: prod_img_blobs_003
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_categories_004'
+down_revision = 'prod_img_blobs_003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('categories',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_products_category_id'), ['category_id'], unique=False)
+        batch_op.create_foreign_key('fk_products_category_id_categories', 'categories', ['category_id'], ['id'])
+
+    op.execute('''
+        INSERT INTO categories (name, created_at)
+        SELECT DISTINCT category, CURRENT_TIMESTAMP FROM products
+        WHERE category IS NOT NULL AND category != ''
+    ''')
+    op.execute('''
+        UPDATE products SET category_id = (SELECT id FROM categories WHERE categories.name = products.category)
+    ''')
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('category')
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category', sa.String(length=50), nullable=True))
+
+    op.execute('''
+        UPDATE products SET category = (SELECT name FROM categories WHERE categories.id = products.category_id)
+    ''')
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_products_category_id_categories', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_products_category_id'))
+        batch_op.drop_column('category_id')
+
+    op.drop_table('categories')
@@ -0,0 +1,53 @@
+"""Inventory ledger index, daily snapshots and opening balances
+
+Revision ID: inventory_ledger_006
+Revises: page_versions_005
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'inventory_ledger_006'
+down_revision = 'page_versions_005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('inventory_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('snapshot_date', sa.Date(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('units_in', sa.Integer(), nullable=False),
+        sa.Column('units_out', sa.Integer(), nullable=False),
+        sa.Column('last_log_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('product_id', 'snapshot_date', name='uq_inventory_snapshots_product_date')
+    )
+    with op.batch_alter_table('inventory_log', schema=None) as batch_op:
+        batch_op.create_index('ix_inventory_log_product_id_id', ['product_id', 'id'], unique=False)
+
+    # Nothing wrote the ledger before; open it with each product's current stock
+    op.execute('''
+        INSERT INTO inventory_log (product_id, change_type, quantity_change, previous_quantity,
+                                   new_quantity, notes, created_at, created_by)
+        SELECT id, 'adjustment', COALESCE(quantity, 0), 0, COALESCE(quantity, 0),
+               'Opening balance', CURRENT_TIMESTAMP, vendor_id
+        FROM products
+        WHERE COALESCE(quantity, 0) != 0
+          AND id NOT IN (SELECT product_id FROM inventory_log)
+    ''')
+
+
+def downgrade():
+    op.execute("DELETE FROM inventory_log WHERE notes = 'Opening balance'")
+    with op.batch_alter_table('inventory_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_inventory_log_product_id_id')
+
+    op.drop_table('inventory_snapshots')
@@ -0,0 +1,36 @@
+"""Low-stock indexes keyed on the flag
+
+Revision ID: low_stock_flag_017
+Revises: order_item_keys_016
+Create Date: 2026-10-18 02:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'low_stock_flag_017'
+down_revision = 'order_item_keys_016'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_low_stock')
+        batch_op.create_index('ix_products_low_stock', ['low_stock_since', 'id'], unique=False,
+                              sqlite_where=sa.text('low_stock_since IS NOT NULL'),
+                              postgresql_where=sa.text('low_stock_since IS NOT NULL'))
+        batch_op.create_index('ix_products_vendor_low_stock', ['vendor_id', 'low_stock_since'], unique=False,
+                              sqlite_where=sa.text('low_stock_since IS NOT NULL'),
+                              postgresql_where=sa.text('low_stock_since IS NOT NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_vendor_low_stock')
+        batch_op.drop_index('ix_products_low_stock')
+        batch_op.create_index('ix_products_low_stock', ['vendor_id', 'low_stock_since'], unique=False,
+                              sqlite_where=sa.text('quantity <= min_quantity AND is_active = 1'),
+                              postgresql_where=sa.text('quantity <= min_quantity AND is_active'))
@@ -0,0 +1,36 @@
+"""Low-stock tracking
+
+Revision ID: low_stock_013
+Revises: user_directory_012
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'low_stock_013'
+down_revision = 'user_directory_012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('low_stock_since', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_products_low_stock', ['vendor_id', 'low_stock_since'], unique=False,
+                              sqlite_where=sa.text('quantity <= min_quantity AND is_active = 1'),
+                              postgresql_where=sa.text('quantity <= min_quantity AND is_active'))
+
+    # Products already at or under their threshold start out flagged
+    op.execute('''
+        UPDATE products SET low_stock_since = CURRENT_TIMESTAMP
+        WHERE quantity <= min_quantity AND is_active
+    ''')
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_low_stock')
+        batch_op.drop_column('low_stock_since')
@@ -0,0 +1,48 @@
+"""Category and vendor on order items at the time of sale
+
+Revision ID: order_item_keys_016
+Revises: product_search_015
+Create Date: 2026-10-18 01:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'order_item_keys_016'
+down_revision = 'product_search_015'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('vendor_id', sa.Integer(), nullable=True))
+
+    # Existing lines get the product's current keys, and the rollup is
+    # recomputed from them (same grouping as utils.sales_rollup.rebuild)
+    op.execute('''
+        UPDATE order_item
+        SET category_id = (SELECT p.category_id FROM products p WHERE p.id = order_item.product_id),
+            vendor_id = (SELECT p.vendor_id FROM products p WHERE p.id = order_item.product_id)
+    ''')
+    op.execute('DELETE FROM sales_daily')
+    op.execute('''
+        INSERT INTO sales_daily (day, status, payment_status, category_id, vendor_id, orders, units, revenue)
+        SELECT date(o.created_at), COALESCE(o.status, 'pending'), COALESCE(o.payment_status, 'pending'),
+               COALESCE(i.category_id, 0), COALESCE(i.vendor_id, 0),
+               COUNT(DISTINCT o.id), SUM(i.quantity), SUM(i.quantity * i.price)
+        FROM order_item i
+        JOIN orders o ON o.id = i.order_id
+        WHERE o.created_at IS NOT NULL
+        GROUP BY date(o.created_at), COALESCE(o.status, 'pending'), COALESCE(o.payment_status, 'pending'),
+                 COALESCE(i.category_id, 0), COALESCE(i.vendor_id, 0)
+    ''')
+
+
+def downgrade():
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_column('vendor_id')
+        batch_op.drop_column('category_id')
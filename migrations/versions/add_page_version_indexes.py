@@ -0,0 +1,59 @@
+"""Index the columns used to version public pages
+
+Revision ID: page_versions_005
+Revises: add_categories_004
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'page_versions_005'
+down_revision = 'add_categories_004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('categories', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE categories SET updated_at = created_at')
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_products_updated_at'), ['updated_at'], unique=False)
+
+    with op.batch_alter_table('product_images', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_product_images_product_id'), ['product_id'], unique=False)
+
+    with op.batch_alter_table('blog_posts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_blog_posts_updated_at'), ['updated_at'], unique=False)
+
+    with op.batch_alter_table('forum_topics', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_forum_topics_updated_at'), ['updated_at'], unique=False)
+
+    with op.batch_alter_table('forum_messages', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_forum_messages_topic_id'), ['topic_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_forum_messages_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('forum_messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_forum_messages_updated_at'))
+        batch_op.drop_index(batch_op.f('ix_forum_messages_topic_id'))
+
+    with op.batch_alter_table('forum_topics', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_forum_topics_updated_at'))
+
+    with op.batch_alter_table('blog_posts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_blog_posts_updated_at'))
+
+    with op.batch_alter_table('product_images', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_images_product_id'))
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_products_updated_at'))
+
+    with op.batch_alter_table('categories', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,41 @@
+"""Add denormalized rating and sales counters to products
+
+Revision ID: add_prod_stats_002
+Revises: add_prod_img_001
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_prod_stats_002'
+down_revision = 'add_prod_img_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('review_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('units_sold', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from the source tables
+    op.execute('''
+        UPDATE products SET
+            review_count = (SELECT COUNT(*) FROM review
+                            WHERE review.product_id = products.id AND review.is_approved = 1),
+            rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM review
+                          WHERE review.product_id = products.id AND review.is_approved = 1),
+            units_sold = (SELECT COALESCE(SUM(quantity), 0) FROM order_item
+                          WHERE order_item.product_id = products.id)
+    ''')
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('units_sold')
+        batch_op.drop_column('rating_sum')
+        batch_op.drop_column('review_count')
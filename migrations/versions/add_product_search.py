@@ -0,0 +1,48 @@
+"""Full-text product search table
+
+Revision ID: product_search_015
+Revises: review_queue_014
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger('alembic.env')
+
+
+# revision identifiers, used by Alembic.
+revision = 'product_search_015'
+down_revision = 'review_queue_014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite only; without FTS5 (or on other databases) search uses LIKE
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    try:
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts "
+            "USING fts5(name, description, category, sub_category, tokenize='unicode61 remove_diacritics 2')"
+        )
+    except sa.exc.OperationalError:
+        logger.warning('SQLite FTS5 is not available; skipping products_fts.')
+        return
+    # same rows as `manage.py rebuild-search`
+    op.execute(
+        "INSERT INTO products_fts (rowid, name, description, category, sub_category) "
+        "SELECT p.id, COALESCE(p.name, ''), COALESCE(p.description, ''), COALESCE(c.name, ''), "
+        "COALESCE(p.sub_category, '') "
+        "FROM products p LEFT JOIN categories c ON c.id = p.category_id "
+        "WHERE p.id NOT IN (SELECT rowid FROM products_fts)"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS products_fts")
@@ -0,0 +1,82 @@
+"""Indexes for foreign keys and hot query paths
+
+Revision ID: query_indexes_010
+Revises: order_grid_009
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'query_indexes_010'
+down_revision = 'order_grid_009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.create_index('ix_cart_user_id_product_id', ['user_id', 'product_id'], unique=False)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_created_at', ['created_at'], unique=False)
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_item_product_id'), ['product_id'], unique=False)
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_products_vendor_id'), ['vendor_id'], unique=False)
+        batch_op.create_index('ix_products_active_created_at', ['created_at'], unique=False,
+                              sqlite_where=sa.text('is_active = 1'), postgresql_where=sa.text('is_active'))
+
+    with op.batch_alter_table('review', schema=None) as batch_op:
+        batch_op.create_index('ix_review_approved_product_id_created_at', ['product_id', 'created_at'], unique=False,
+                              sqlite_where=sa.text('is_approved = 1'), postgresql_where=sa.text('is_approved'))
+
+    with op.batch_alter_table('consultations', schema=None) as batch_op:
+        batch_op.create_index('ix_consultations_consultant_id_created_at', ['consultant_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_consultations_client_id_created_at', ['client_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('forum_messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_forum_messages_topic_id'))
+        batch_op.create_index('ix_forum_messages_topic_id_created_at', ['topic_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('blog_posts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_blog_posts_created_at'), ['created_at'], unique=False)
+
+    with op.batch_alter_table('blog_comments', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_blog_comments_post_id'), ['post_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('blog_comments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_blog_comments_post_id'))
+
+    with op.batch_alter_table('blog_posts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_blog_posts_created_at'))
+
+    with op.batch_alter_table('forum_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_forum_messages_topic_id_created_at')
+        batch_op.create_index(batch_op.f('ix_forum_messages_topic_id'), ['topic_id'], unique=False)
+
+    with op.batch_alter_table('consultations', schema=None) as batch_op:
+        batch_op.drop_index('ix_consultations_client_id_created_at')
+        batch_op.drop_index('ix_consultations_consultant_id_created_at')
+
+    with op.batch_alter_table('review', schema=None) as batch_op:
+        batch_op.drop_index('ix_review_approved_product_id_created_at')
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_active_created_at')
+        batch_op.drop_index(batch_op.f('ix_products_vendor_id'))
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_item_product_id'))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_created_at')
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_index('ix_cart_user_id_product_id')
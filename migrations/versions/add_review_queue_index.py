@@ -0,0 +1,26 @@
+"""Index for the review moderation queue
+
+Revision ID: review_queue_014
+Revises: low_stock_013
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'review_queue_014'
+down_revision = 'low_stock_013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('review', schema=None) as batch_op:
+        batch_op.create_index('ix_review_is_approved_created_at', ['is_approved', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('review', schema=None) as batch_op:
+        batch_op.drop_index('ix_review_is_approved_created_at')
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""Daily sales rollup
+
+Revision ID: sales_daily_011
+Revises: query_indexes_010
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'sales_daily_011'
+down_revision = 'query_indexes_010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sales_daily',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('payment_status', sa.String(length=20), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('vendor_id', sa.Integer(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'status', 'payment_status', 'category_id', 'vendor_id', name='uq_sales_daily_key')
+    )
+
+    # Same grouping as utils.sales_rollup.rebuild
+    op.execute('''
+        INSERT INTO sales_daily (day, status, payment_status, category_id, vendor_id, orders, units, revenue)
+        SELECT date(o.created_at), COALESCE(o.status, 'pending'), COALESCE(o.payment_status, 'pending'),
+               COALESCE(p.category_id, 0), p.vendor_id,
+               COUNT(DISTINCT o.id), SUM(i.quantity), SUM(i.quantity * i.price)
+        FROM order_item i
+        JOIN orders o ON o.id = i.order_id
+        JOIN products p ON p.id = i.product_id
+        WHERE o.created_at IS NOT NULL
+        GROUP BY date(o.created_at), COALESCE(o.status, 'pending'), COALESCE(o.payment_status, 'pending'),
+                 COALESCE(p.category_id, 0), p.vendor_id
+    ''')
+
+
+def downgrade():
+    op.drop_table('sales_daily')
@@ -0,0 +1,28 @@
+"""Indexes for the admin user directory
+
+Revision ID: user_directory_012
+Revises: sales_daily_011
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'user_directory_012'
+down_revision = 'sales_daily_011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_role_created_at', ['role', 'created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_users_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_created_at'))
+        batch_op.drop_index('ix_users_role_created_at')
@@ -0,0 +1,84 @@
+"""Move product images from base64 TEXT into the blob store
+
+Revision ID: prod_img_blobs_003
+Revises: add_prod_stats_002
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+import base64
+
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = 'prod_img_blobs_003'
+down_revision = 'add_prod_stats_002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from utils import blob_store
+
+    with op.batch_alter_table('product_images', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blob_key', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('content_type', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('byte_size', sa.Integer(), nullable=True))
+        batch_op.alter_column('img_data', existing_type=sa.Text(), nullable=True)
+
+    conn = op.get_bind()
+    # Fetch ids first and each row on its own, so only one image is in memory
+    ids = [row[0] for row in conn.execute(sa.text(
+        "SELECT id FROM product_images WHERE blob_key IS NULL AND img_data IS NOT NULL"))]
+    with current_app.test_request_context():
+        for image_id in ids:
+            row = conn.execute(sa.text("SELECT product_id, img_data FROM product_images WHERE id = :id"),
+                               {'id': image_id}).first()
+            try:
+                data = base64.b64decode(row.img_data)
+            except ValueError:
+                continue
+            key, size, content_type = blob_store.put(data)
+            conn.execute(sa.text(
+                "UPDATE product_images SET blob_key = :key, content_type = :ctype, byte_size = :size, "
+                "img_data = NULL WHERE id = :id"),
+                {'key': key, 'ctype': content_type, 'size': size, 'id': image_id})
+
+        # Point data: URIs at the product's first stored image
+        products = conn.execute(sa.text("SELECT id FROM products WHERE img_url LIKE 'data:%'")).fetchall()
+        for (product_id,) in products:
+            first = conn.execute(sa.text(
+                "SELECT blob_key, content_type FROM product_images WHERE product_id = :pid "
+                "AND blob_key IS NOT NULL ORDER BY created_at, id LIMIT 1"), {'pid': product_id}).first()
+            img_url = blob_store.url(first.blob_key, first.content_type) if first else ''
+            conn.execute(sa.text("UPDATE products SET img_url = :url WHERE id = :id"),
+                         {'url': img_url, 'id': product_id})
+
+
+def downgrade():
+    from utils import blob_store
+
+    conn = op.get_bind()
+    ids = [row[0] for row in conn.execute(sa.text(
+        "SELECT id FROM product_images WHERE img_data IS NULL AND blob_key IS NOT NULL"))]
+    for image_id in ids:
+        key = conn.execute(sa.text("SELECT blob_key FROM product_images WHERE id = :id"), {'id': image_id}).scalar()
+        with open(blob_store.path_for(key), 'rb') as f:
+            img_data = base64.b64encode(f.read()).decode('utf-8')
+        conn.execute(sa.text("UPDATE product_images SET img_data = :data WHERE id = :id"),
+                     {'data': img_data, 'id': image_id})
+    conn.execute(sa.text("DELETE FROM product_images WHERE img_data IS NULL"))
+    conn.execute(sa.text(
+        "UPDATE products SET img_url = 'data:image/jpeg;base64,' || ("
+        "SELECT img_data FROM product_images WHERE product_images.product_id = products.id "
+        "ORDER BY created_at, id LIMIT 1) "
+        "WHERE img_url LIKE '/media/%' AND EXISTS ("
+        "SELECT 1 FROM product_images WHERE product_images.product_id = products.id)"))
+
+    with op.batch_alter_table('product_images', schema=None) as batch_op:
+        batch_op.alter_column('img_data', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_column('byte_size')
+        batch_op.drop_column('content_type')
+        batch_op.drop_column('blob_key')
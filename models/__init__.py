@@ -9,8 +9,9 @@ from .post_model import Post,BlogComment
 from .consultant_model import Consultant
 from .consultation_models import Consultation
 from .specialization_model import ConsultantSpecialization
-from .product_model import Product, Review, ProductImage
-from .order_model import Order, OrderItem, Cart, Payment, InventoryLog
+from .product_model import Category, Product, Review, ProductImage
+from .order_model import Order, OrderItem, Cart, Payment, InventoryLog, InventorySnapshot, StockReservation, SalesDaily
 from .forum_model import ForumTopic, ForumMessage
+from .email_model import EmailOutbox
 
-__all__ = ['User', 'Product', 'Review', 'ProductImage', 'Order', 'OrderItem', 'Cart', 'Payment', 'InventoryLog', 'Post', 'BlogComment', 'Consultant', 'Consultation', 'ConsultantSpecialization', 'ForumTopic', 'ForumMessage']
+__all__ = ['User', 'Category', 'Product', 'Review', 'ProductImage', 'Order', 'OrderItem', 'Cart', 'Payment', 'InventoryLog', 'InventorySnapshot', 'StockReservation', 'SalesDaily', 'Post', 'BlogComment', 'Consultant', 'Consultation', 'ConsultantSpecialization', 'ForumTopic', 'ForumMessage', 'EmailOutbox']
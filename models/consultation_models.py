@@ -23,3 +23,10 @@ class Consultation(db.Model):
     client_rating = db.Column(db.Integer)
     client_feedback = db.Column(db.Text)
 
+    # per-consultant request lists and per-client history, newest first
+    __table_args__ = (
+        db.Index('ix_consultations_consultant_id_created_at', 'consultant_id', 'created_at'),
+        db.Index('ix_consultations_client_id_created_at', 'client_id', 'created_at'),
+    )
+
+
@@ -13,7 +13,7 @@ class ForumTopic(db.Model):
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationship to messages
     messages = db.relationship('ForumMessage', backref='topic', lazy=True, cascade='all, delete-orphan')
@@ -43,7 +43,12 @@ class ForumMessage(db.Model):
 
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # a discussion page lists one topic's messages oldest first
+    __table_args__ = (
+        db.Index('ix_forum_messages_topic_id_created_at', 'topic_id', 'created_at'),
+    )
 
     def __repr__(self):
         return f'<ForumMessage {self.id}>'
\ No newline at end of file
@@ -10,6 +10,24 @@ class Cart(db.Model):
 
     product = db.relationship('Product', backref='cart_items')
 
+    __table_args__ = (
+        db.Index('ix_cart_user_id_product_id', 'user_id', 'product_id'),
+    )
+
+class StockReservation(db.Model):
+    # Time-limited hold on stock for a cart line, written through utils.reservations
+    __tablename__ = 'stock_reservations'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'user_id', name='uq_stock_reservations_product_user'),
+    )
+
 class Order(db.Model):
     __tablename__ = 'orders'
     id = db.Column(db.Integer, primary_key=True)
@@ -21,14 +39,25 @@ class Order(db.Model):
     shipping_address = db.Column(db.Text, nullable=False)
     tracking_number = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # admin order grid: status filter and per-customer history, newest first
+    __table_args__ = (
+        db.Index('ix_orders_created_at', 'created_at'),
+        db.Index('ix_orders_status_created_at', 'status', 'created_at'),
+        db.Index('ix_orders_user_id_created_at', 'user_id', 'created_at'),
+    )
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
+    # The product's category and vendor at the time of sale: the sales_daily
+    # keys this line is counted under (see utils.sales_rollup)
+    category_id = db.Column(db.Integer, nullable=True)
+    vendor_id = db.Column(db.Integer, nullable=True)
 
 class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -40,6 +69,7 @@ class Payment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class InventoryLog(db.Model):
+    # Append-only stock ledger, written through utils.inventory
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     change_type = db.Column(db.String(20))  # restock, sale, adjustment, return
@@ -48,4 +78,41 @@ class InventoryLog(db.Model):
     new_quantity = db.Column(db.Integer, nullable=False)
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
\ No newline at end of file
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_inventory_log_product_id_id', 'product_id', 'id'),
+    )
+
+class InventorySnapshot(db.Model):
+    # Daily per-product stock position; ledger rows up to last_log_id are included
+    __tablename__ = 'inventory_snapshots'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    snapshot_date = db.Column(db.Date, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    units_in = db.Column(db.Integer, nullable=False, default=0)  # since the previous snapshot
+    units_out = db.Column(db.Integer, nullable=False, default=0)
+    last_log_id = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'snapshot_date', name='uq_inventory_snapshots_product_date'),
+    )
+class SalesDaily(db.Model):
+    # Per-day order rollup, maintained by utils.sales_rollup; category_id 0 means uncategorized
+    __tablename__ = 'sales_daily'
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    payment_status = db.Column(db.String(20), nullable=False)
+    category_id = db.Column(db.Integer, nullable=False, default=0)
+    vendor_id = db.Column(db.Integer, nullable=False)
+    orders = db.Column(db.Integer, nullable=False, default=0)  # orders with a line in this group
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'status', 'payment_status', 'category_id', 'vendor_id',
+                            name='uq_sales_daily_key'),
+    )
@@ -13,8 +13,8 @@ class Post(db.Model):
     # ✅ ADDED: Foreign key for author relationship
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     comments = db.relationship('BlogComment', backref='post', lazy=True)
 
@@ -38,7 +38,7 @@ class BlogComment(db.Model):
     __tablename__ = 'blog_comments'
     
     id = db.Column(db.Integer, primary_key=True)
-    post_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id'), nullable=False, index=True)
     
     # ✅ FIXED: Only one user foreign key
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
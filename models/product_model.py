@@ -1,5 +1,30 @@
 from models import db
 from datetime import datetime
+from sqlalchemy import case, select
+from sqlalchemy.ext.hybrid import hybrid_property
+
+class Category(db.Model):
+    __tablename__ = 'categories'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @classmethod
+    def get_or_create(cls, name):
+        """Return the category called ``name``, adding it to the session if new."""
+        # a category added earlier in this unit of work is not in the table yet
+        category = next((obj for obj in db.session.new if isinstance(obj, cls) and obj.name == name), None)
+        if category is None:
+            with db.session.no_autoflush:
+                category = cls.query.filter_by(name=name).first()
+        if category is None:
+            category = cls(name=name)
+            db.session.add(category)
+        return category
+
+    def __repr__(self):
+        return f"<Category {self.name}>"
 
 class Product(db.Model):
     __tablename__= 'products'
@@ -7,21 +32,75 @@ class Product(db.Model):
     name = db.Column(db.String(100),nullable=False)
     description = db.Column(db.Text,nullable=True)
     price = db.Column(db.Float,nullable=False)
-    category = db.Column(db.String(50),nullable=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True, index=True)
     sub_category = db.Column(db.String(50))
     img_url = db.Column(db.String(300),nullable=False)
     in_stock = db.Column(db.Boolean, default=True)
     quantity = db.Column(db.Integer, default=0)
     min_quantity = db.Column(db.Integer, default=5)  # Low stock threshold
-    vendor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    vendor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Denormalized counters, maintained by utils.product_stats
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # approved reviews
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    units_sold = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Units held by live cart reservations, maintained by utils.reservations
+    reserved_quantity = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # When stock last fell to min_quantity or below; maintained by utils.low_stock
+    low_stock_since = db.Column(db.DateTime, nullable=True)
+
+    # marketplace listing: active products only, newest first;
+    # low-stock alerts: only the (few) flagged products, longest-low first
+    __table_args__ = (
+        db.Index('ix_products_active_created_at', 'created_at',
+                 sqlite_where=db.text('is_active = 1'), postgresql_where=db.text('is_active')),
+        db.Index('ix_products_low_stock', 'low_stock_since', 'id',
+                 sqlite_where=db.text('low_stock_since IS NOT NULL'),
+                 postgresql_where=db.text('low_stock_since IS NOT NULL')),
+        db.Index('ix_products_vendor_low_stock', 'vendor_id', 'low_stock_since',
+                 sqlite_where=db.text('low_stock_since IS NOT NULL'),
+                 postgresql_where=db.text('low_stock_since IS NOT NULL')),
+    )
 
     # Relationships
     reviews = db.relationship('Review', backref='product', lazy=True)
     order_items = db.relationship('OrderItem', backref='product', lazy=True)
+    category_ref = db.relationship('Category', backref='products', lazy='joined')
+
+    # Category name; assigning a name looks up (or creates) the Category row
+    @hybrid_property
+    def category(self):
+        return self.category_ref.name if self.category_ref else None
+
+    @category.setter
+    def category(self, name):
+        self.category_ref = Category.get_or_create(name) if name else None
+
+    @category.expression
+    def category(cls):
+        return select(Category.name).where(Category.id == cls.category_id).scalar_subquery()
+
+    @hybrid_property
+    def avg_rating(self):
+        if not self.review_count:
+            return 0.0
+        return self.rating_sum / self.review_count
+
+    @avg_rating.expression
+    def avg_rating(cls):
+        return case((cls.review_count > 0, cls.rating_sum * 1.0 / cls.review_count), else_=0.0)
+
+    # Available to promise: stock not already held by someone's cart
+    @hybrid_property
+    def available_quantity(self):
+        return max((self.quantity or 0) - (self.reserved_quantity or 0), 0)
+
+    @available_quantity.expression
+    def available_quantity(cls):
+        return cls.quantity - cls.reserved_quantity
 
     def __repr__(self):
         return f"<Product {self.name}>"
@@ -35,15 +114,33 @@ class Review(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_approved = db.Column(db.Boolean, default=False)
 
+    # product page: approved reviews of one product, newest first;
+    # admin moderation queue: reviews by approval state, oldest first
+    __table_args__ = (
+        db.Index('ix_review_approved_product_id_created_at', 'product_id', 'created_at',
+                 sqlite_where=db.text('is_approved = 1'), postgresql_where=db.text('is_approved')),
+        db.Index('ix_review_is_approved_created_at', 'is_approved', 'created_at'),
+    )
+
 class ProductImage(db.Model):
     __tablename__ = 'product_images'
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
-    img_data = db.Column(db.Text, nullable=False)  # Base64 encoded image data
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
+    img_data = db.Column(db.Text, nullable=True)  # Legacy base64 data, superseded by blob_key
+    blob_key = db.Column(db.String(64))  # SHA-256 key in utils.blob_store
+    content_type = db.Column(db.String(50))
+    byte_size = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationship back to product
     product = db.relationship('Product', backref='images', lazy=True)
 
+    @property
+    def url(self):
+        if self.blob_key:
+            from utils import blob_store
+            return blob_store.url(self.blob_key, self.content_type)
+        return f"data:image/jpeg;base64,{self.img_data}"
+
     def __repr__(self):
         return f"<ProductImage {self.id} for Product {self.product_id}>"
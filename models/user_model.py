@@ -23,7 +23,7 @@ class User(UserMixin, db.Model):
     availability = db.Column(db.String(50), default='weekdays')  # weekdays, weekends, flexible
     rating = db.Column(db.Float, default=0.0)  # Average consultant rating
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     profile_picture = db.Column(db.String(200))
     phone = db.Column(db.String(20))
     address = db.Column(db.Text)
@@ -53,6 +53,11 @@ class User(UserMixin, db.Model):
     reset_token = db.Column(db.String(100), unique=True)
     reset_token_expires = db.Column(db.DateTime)
 
+    # admin user directory: role filter, newest first
+    __table_args__ = (
+        db.Index('ix_users_role_created_at', 'role', 'created_at'),
+    )
+
     # ✅ One-directional relationship
     posts = db.relationship('Post', backref='author', lazy=True)
 
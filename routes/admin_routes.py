@@ -1,10 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, Response, stream_with_context
 from flask_login import login_required, current_user
 from functools import wraps
-from models import db, User, Product, Order, Consultant, ProductImage
+from models import db, User, Category, Product, Order, Consultant, ProductImage, InventoryLog, InventorySnapshot
 from datetime import datetime, timedelta
-from sqlalchemy import func
-import base64
+from utils import admin_lists, blob_store, bulk_actions, exports, facets, image_pipeline, inventory, low_stock, orders, sales_rollup
+from utils import dashboard as dashboard_snapshot
 
 # ✅ Main admin blueprint
 bp = Blueprint('admin', __name__,url_prefix='/admin')
@@ -24,23 +24,26 @@ def admin_required(f):
 @login_required
 @admin_required
 def dashboard():
-    # Admin statistics
-    total_users = User.query.count()
-    total_products = Product.query.count() if hasattr(Product, 'query') else 0
-    total_orders = Order.query.count() if hasattr(Order, 'query') else 0
-    total_consultants = Consultant.query.count() if hasattr(Consultant, 'query') else 0
-    
-    # Recent activities
-    recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
-    recent_orders = Order.query.order_by(Order.created_at.desc()).limit(5).all() if hasattr(Order, 'query') else []
-    
+    # Counts and recent activity come from the periodically refreshed snapshot
+    snapshot = dashboard_snapshot.snapshot()
+    counts = snapshot['counts']
     return render_template('admin/dashboard.html',
-                         total_users=total_users,
-                         total_products=total_products,
-                         total_orders=total_orders,
-                         total_consultants=total_consultants,
-                         recent_users=recent_users,
-                         recent_orders=recent_orders)
+                         total_users=counts['users'],
+                         total_products=counts['products'],
+                         total_orders=counts['orders'],
+                         total_consultants=counts['consultants'],
+                         counts=counts,
+                         recent_users=snapshot['recent_users'],
+                         recent_orders=snapshot['recent_orders'],
+                         refreshed_at=snapshot['refreshed_at'])
+
+@bp.route('/dashboard/refresh', methods=['POST'])
+@login_required
+@admin_required
+def refresh_dashboard():
+    dashboard_snapshot.refresh()
+    flash('Dashboard refreshed.', 'success')
+    return redirect(url_for('admin.dashboard'))
 
 # ✅ Admin Index (redirect to dashboard)
 @bp.route('/')
@@ -54,8 +57,15 @@ def index():
 @login_required
 @admin_required
 def manage_users():
-    users = User.query.all()
-    return render_template('admin/users.html', users=users)
+    q = request.args.get('q')
+    role = request.args.get('role')
+    sort = request.args.get('sort')
+    after = request.args.get('after')  # keyset cursor from the previous page
+    page = admin_lists.user_page(q=q, role=role, sort=sort, after=after)
+    role_counts = admin_lists.user_role_counts(q=q)
+    return render_template('admin/users.html', users=page.items, page=page, role_counts=role_counts,
+                           roles=admin_lists.USER_ROLES, sorts=admin_lists.USER_SORTS,
+                           q=q, role=role, sort=sort, after=after)
 
 # ✅ Update User Role
 @bp.route('/update-user-role/<int:user_id>', methods=['POST'])
@@ -65,7 +75,7 @@ def update_user_role(user_id):
     user = User.query.get_or_404(user_id)
     new_role = request.json.get('role')
     
-    if new_role in ['customer', 'farmer', 'vendor', 'consultant', 'admin']:
+    if new_role in admin_lists.USER_ROLES:
         user.role = new_role
         db.session.commit()
         return {'success': True, 'new_role': new_role}
@@ -97,20 +107,10 @@ def manage_products():
     category = request.args.get('category')
     status = request.args.get('status')
 
-    query = Product.query
-    if q:
-        query = query.filter(Product.name.ilike(f"%{q}%"))
-    if category:
-        query = query.filter(Product.category == category)
-    if status == 'active':
-        query = query.filter(Product.is_active == True)
-    elif status == 'disabled':
-        query = query.filter(Product.is_active == False)
-
+    query = admin_lists.filter_products(Product.query, q=q, category=category, status=status)
     products = query.order_by(Product.created_at.desc()).all()
 
-    # gather categories
-    categories = [c[0] for c in db.session.query(Product.category).distinct().all() if c[0]]
+    categories = facets.category_names()
     return render_template('admin/products.html', products=products, categories=categories, q=q, category=category, status=status)
 
 
@@ -135,7 +135,8 @@ def edit_product(product_id):
         p.description = request.form.get('description')
         p.price = float(request.form.get('price') or p.price)
         p.category = request.form.get('category') or None
-        p.quantity = int(request.form.get('quantity') or p.quantity)
+        # stock changes go through the ledger
+        inventory.set_quantity(p, int(request.form.get('quantity') or p.quantity), current_user.id, 'Edited in admin')
         p.min_quantity = int(request.form.get('min_quantity') or p.min_quantity)
         p.in_stock = bool(request.form.get('in_stock'))
 
@@ -150,46 +151,76 @@ def edit_product(product_id):
 
             # Delete existing images
             ProductImage.query.filter_by(product_id=product_id).delete()
-            first_img_data = None
+            # Blobs are shared by content, so the old files are left in place
+            first_image = None
             for image_file in valid_images:
-                img_data = base64.b64encode(image_file.read()).decode('utf-8')
-                if first_img_data is None:
-                    first_img_data = img_data
-                product_image = ProductImage(product_id=product_id, img_data=img_data)
+                key, size, content_type = blob_store.put_upload(image_file)
+                product_image = ProductImage(product_id=product_id, blob_key=key, content_type=content_type, byte_size=size)
+                if first_image is None:
+                    first_image = product_image
                 db.session.add(product_image)
-            if first_img_data:
-                p.img_url = f"data:image/jpeg;base64,{first_img_data}"
+            if first_image:
+                p.img_url = first_image.url
 
         db.session.commit()
+        if valid_images:
+            image_pipeline.schedule([img.blob_key for img in p.images])
         flash('Product updated.', 'success')
         return redirect(url_for('admin.manage_products'))
 
-    categories = [c[0] for c in db.session.query(Product.category).distinct().all() if c[0]]
+    categories = facets.category_names()
     return render_template('admin/edit_product.html', product=p, categories=categories)
 
 
+@bp.route('/product/<int:product_id>/stock')
+@login_required
+@admin_required
+def stock_history(product_id):
+    p = Product.query.get_or_404(product_id)
+    before = request.args.get('before', type=int)
+    entries = InventoryLog.query.filter(InventoryLog.product_id == product_id)
+    if before:
+        entries = entries.filter(InventoryLog.id < before)
+    entries = entries.order_by(InventoryLog.id.desc()).limit(50).all()
+    snapshots = (InventorySnapshot.query.filter_by(product_id=product_id)
+                 .order_by(InventorySnapshot.snapshot_date.desc()).limit(14).all())
+    ledger_quantity = inventory.stock_at(product_id, datetime.utcnow())
+    return render_template('admin/stock_history.html', product=p, entries=entries, snapshots=snapshots,
+                           weeks=inventory.weekly_movement(product_id), ledger_quantity=ledger_quantity)
+
+
+@bp.route('/low-stock')
+@login_required
+@admin_required
+def low_stock_products():
+    vendor_id = request.args.get('vendor', type=int)
+    products = low_stock.alerts(vendor_id=vendor_id)
+    return render_template('admin/low_stock.html', products=products, vendor_id=vendor_id)
+
+
 @bp.route('/categories', methods=['GET','POST'])
 @login_required
 @admin_required
 def manage_categories():
     # View categories and allow rename/delete via POST
-    categories = [c[0] for c in db.session.query(Product.category).distinct().all() if c[0]]
     if request.method == 'POST':
         action = request.form.get('action')
-        src = request.form.get('src')
+        category = Category.query.get_or_404(request.form.get('src', type=int))
+        src = category.name
         if action == 'delete':
-            # remove category from products
-            Product.query.filter(Product.category == src).update({Product.category: None})
+            # products in it become uncategorized
+            facets.delete_category(category)
             db.session.commit()
             flash(f'Category "{src}" removed from products.', 'success')
         elif action == 'rename':
-            dst = request.form.get('dst')
-            Product.query.filter(Product.category == src).update({Product.category: dst})
-            db.session.commit()
-            flash(f'Category "{src}" renamed to "{dst}".', 'success')
+            dst = (request.form.get('dst') or '').strip()
+            if dst:
+                facets.rename_category(category, dst)
+                db.session.commit()
+                flash(f'Category "{src}" renamed to "{dst}".', 'success')
         return redirect(url_for('admin.manage_categories'))
 
-    return render_template('admin/categories.html', categories=categories)
+    return render_template('admin/categories.html', categories=facets.categories())
 
 
 # -----------------------------
@@ -246,13 +277,13 @@ def consultant_requests(consultant_id):
 def manage_orders():
     status = request.args.get('status')
     q = request.args.get('q')
-    query = Order.query
-    if status:
-        query = query.filter(Order.status == status)
-    if q:
-        query = query.join(User).filter(User.email.ilike(f"%{q}%"))
-    orders = query.order_by(Order.created_at.desc()).all()
-    return render_template('admin/orders.html', orders=orders, status=status, q=q)
+    after = request.args.get('after')  # keyset cursor from the previous page
+    page = admin_lists.order_page(status=status, q=q, after=after)
+    totals = admin_lists.order_totals(page.items)
+    status_counts = admin_lists.order_status_counts(q=q)
+    return render_template('admin/orders.html', orders=page.items, page=page, totals=totals,
+                           status_counts=status_counts, statuses=admin_lists.ORDER_STATUSES,
+                           status=status, q=q, after=after)
 
 
 @bp.route('/order/<int:order_id>/update', methods=['POST'])
@@ -261,23 +292,106 @@ def manage_orders():
 def update_order_status(order_id):
     o = Order.query.get_or_404(order_id)
     new_status = request.form.get('status')
-    if new_status:
-        o.status = new_status
-        db.session.commit()
-        flash('Order status updated.', 'success')
+    if new_status not in admin_lists.ORDER_STATUSES:
+        flash('Unknown order status.', 'danger')
+        return redirect(url_for('admin.manage_orders'))
+    try:
+        # stock and units sold follow the order into and out of cancelled
+        if new_status == 'cancelled' and o.status != 'cancelled':
+            inventory.return_order(o, current_user.id)
+        elif o.status == 'cancelled' and new_status != 'cancelled':
+            orders.reopen_order(o, current_user.id)
+    except orders.OutOfStock as e:
+        db.session.rollback()
+        flash(f"Not enough stock to reopen the order: {', '.join(e.product_names)}.", 'danger')
+        return redirect(url_for('admin.manage_orders'))
+    sales_rollup.set_status(o, status=new_status)
+    db.session.commit()
+    flash('Order status updated.', 'success')
     return redirect(url_for('admin.manage_orders'))
 
 
+# Review moderation queue (approve/reject go through /admin/bulk)
+@bp.route('/reviews')
+@login_required
+@admin_required
+def manage_reviews():
+    status = request.args.get('status')
+    if status not in admin_lists.REVIEW_STATUSES:
+        status = 'pending'
+    after = request.args.get('after')  # keyset cursor from the previous page
+    page = admin_lists.review_page(status=status, after=after)
+    return render_template('admin/reviews.html', reviews=page.items, page=page, status=status, after=after,
+                           statuses=admin_lists.REVIEW_STATUSES, pending_count=admin_lists.pending_review_count())
+
+
+# Batch moderation: {"target", "action", "ids": [...], "role"} applied as one UPDATE
+@bp.route('/bulk', methods=['POST'])
+@login_required
+@admin_required
+def bulk_action():
+    data = request.get_json(silent=True) or {}
+    try:
+        results = bulk_actions.apply(data.get('target'), data.get('action'), data.get('ids'),
+                                     role=data.get('role'), actor_id=current_user.id)
+    except bulk_actions.BulkActionError as e:
+        return {'success': False, 'error': str(e)}, 400
+    updated = sum(1 for outcome in results.values() if outcome == 'updated')
+    return {'success': True, 'updated': updated, 'results': results}
+
+
+# Streaming exports; same filters as the list views plus ?since=&until=
+@bp.route('/export/<name>.<fmt>')
+@login_required
+@admin_required
+def export(name, fmt):
+    if name not in exports.EXPORTS or fmt not in exports.FORMATS:
+        abort(404)
+    try:
+        since = exports.parse_date(request.args.get('since'))
+        until = exports.parse_date(request.args.get('until'))
+    except ValueError:
+        abort(400)
+    filters = {key: request.args.get(key) for key in ('status', 'q', 'category', 'role')}
+    filename = f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    body = exports.stream(name, fmt, filters=filters, since=since, until=until)
+    return Response(stream_with_context(body), mimetype=exports.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
 # Enhance dashboard with sales stats
 @bp.route('/dashboard/stats')
 @login_required
 @admin_required
 def dashboard_stats():
-    # last 30 days sales
-    today = datetime.utcnow()
-    since = today - timedelta(days=30)
-    sales_q = db.session.query(func.date(Order.created_at).label('day'), func.coalesce(func.sum(Order.total_amount),0).label('total'))
-    sales_q = sales_q.filter(Order.created_at >= since).group_by(func.date(Order.created_at)).order_by(func.date(Order.created_at)).all()
-    data = [{'day': str(r[0]), 'total': float(r[1])} for r in sales_q]
-    total_sales = db.session.query(func.coalesce(func.sum(Order.total_amount),0)).scalar() or 0
-    return {'total_sales': float(total_sales), 'sales_by_day': data}
\ No newline at end of file
+    # Served from the sales_daily rollup: ?since=&until= (default last 30 days),
+    # ?status=&payment_status=&category_id=&vendor_id= and ?by=category|vendor|status|payment_status
+    try:
+        since = exports.parse_date(request.args.get('since'))
+        until = exports.parse_date(request.args.get('until'))
+    except ValueError:
+        abort(400)
+    since = since.date() if since else (datetime.utcnow() - timedelta(days=30)).date()
+    filters = {
+        'since': since,
+        'until': until.date() if until else None,
+        'status': request.args.get('status'),
+        'payment_status': request.args.get('payment_status'),
+        'category_id': request.args.get('category_id', type=int),
+        'vendor_id': request.args.get('vendor_id', type=int),
+    }
+    by = request.args.get('by')
+    if by is not None and by not in sales_rollup.DIMENSIONS:
+        abort(400)
+    data = [{'day': r['day'], 'total': r['revenue'], 'units': r['units']}
+            for r in sales_rollup.breakdown('day', **filters)]
+    stats = {
+        'total_sales': sales_rollup.total(),
+        'range_sales': sales_rollup.total(**filters),
+        'since': since.isoformat(),
+        'until': filters['until'].isoformat() if filters['until'] else None,
+        'sales_by_day': data,
+    }
+    if by and by != 'day':
+        stats['breakdown'] = sales_rollup.breakdown(by, **filters)
+    return stats
\ No newline at end of file
@@ -0,0 +1,38 @@
+from flask import Blueprint, abort, current_app, request, send_file
+import mimetypes
+import os
+from werkzeug.security import safe_join
+from utils import assets
+
+# ✅ Create blueprint instance
+bp = Blueprint('assets', __name__, url_prefix='/assets')
+
+# One year: every file here has its content hash in the name
+MAX_AGE = 31536000
+
+# Content-Encoding -> suffix of the precompressed sibling, preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+@bp.route('/<path:filename>')
+def serve(filename):
+    root = os.path.join(current_app.static_folder, assets.ASSET_DIR)
+    path = safe_join(root, filename)
+    if path is None or filename.endswith(('.br', '.gz')) or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if request.accept_encodings[name] and os.path.isfile(path + suffix):
+            encoding, path = name, path + suffix
+            break
+
+    # The hash is already in the URL; the etag only has to tell encodings apart
+    etag = f'{filename}-{encoding or "identity"}'
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=etag, max_age=MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -7,7 +7,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_user, logout_user, login_required, current_user
 from models.user_model import User, db
 from models.consultant_model import Consultant
-from utils.email_utils import send_email_if_configured
+from utils.email_utils import queue_email
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -114,7 +114,6 @@ def forgot_password():
             token = secrets.token_urlsafe(32)
             user.reset_token = token
             user.reset_token_expires = datetime.utcnow() + timedelta(hours=1)
-            db.session.commit()
 
             # Send reset email
             reset_url = url_for('auth.reset_password', token=token, _external=True)
@@ -134,7 +133,11 @@ Best regards,
 AgriSphere Team
 '''
 
-            if send_email_if_configured(user.email, subject, body):
+            # the email is queued in the same commit as the token
+            queued = queue_email(user.email, subject, body)
+            db.session.commit()
+
+            if queued:
                 flash('Password reset instructions have been sent to your email.', 'success')
             else:
                 flash('Password reset token generated. Please contact support if email is not configured.', 'info')
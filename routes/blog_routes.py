@@ -3,16 +3,25 @@ from flask_login import login_required, current_user
 from models.post_model import Post
 from models.user_model import db
 from datetime import datetime
+from utils import conditional
 
 bp = Blueprint('blog', __name__, url_prefix='/blog')
 
+def _blog_version():
+    return conditional.table_version(Post.updated_at)
+
+def _post_version(post_id):
+    return conditional.row_version([Post.updated_at], Post.id == post_id)
+
 @bp.route('/')
+@conditional.conditional(_blog_version)
 def index():
     page = request.args.get('page', 1, type=int)
     posts = Post.query.order_by(Post.created_at.desc()).paginate(page=page, per_page=5)
     return render_template('blog.html', posts=posts)
 
 @bp.route('/post/<int:post_id>')
+@conditional.conditional(_post_version)
 def view_post(post_id):
     post = Post.query.get_or_404(post_id)
     return render_template('blog_post.html', post=post)
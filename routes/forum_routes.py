@@ -2,17 +2,34 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from models import db, ForumTopic, ForumMessage, User
 import re
+from utils import conditional
 
 # ✅ Create blueprint instance
 bp = Blueprint('forum', __name__, url_prefix='/forum')
 
+def _forum_version():
+    # the topic list shows message counts
+    return (conditional.table_version(ForumTopic.updated_at),
+            conditional.table_version(ForumMessage.updated_at))
+
+def _discussion_version(slug):
+    topic = conditional.row_version([ForumTopic.id, ForumTopic.updated_at], ForumTopic.slug == slug)
+    if topic is None:
+        return None
+    return (topic, conditional.table_version(ForumMessage.updated_at, ForumMessage.topic_id == topic[0]))
+
 # ✅ Define routes
 @bp.route('/')
+@conditional.conditional(_forum_version)
 def index():
     topics = ForumTopic.query.order_by(ForumTopic.created_at.desc()).all()
-    return render_template('forum.html', topics=topics)
+    # one GROUP BY for all rows; the count is also part of each row's cache key
+    message_counts = dict(db.session.query(ForumMessage.topic_id, db.func.count(ForumMessage.id))
+                          .group_by(ForumMessage.topic_id))
+    return render_template('forum.html', topics=topics, message_counts=message_counts)
 
 @bp.route('/discussion/<slug>')
+@conditional.conditional(_discussion_version)
 def discussion(slug):
     topic = ForumTopic.query.filter_by(slug=slug).first_or_404()
     messages = ForumMessage.query.filter_by(topic_id=topic.id).order_by(ForumMessage.created_at.asc()).all()
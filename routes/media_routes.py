@@ -0,0 +1,52 @@
+from flask import Blueprint, abort, current_app, redirect, send_file
+import os
+from utils import blob_store, image_pipeline
+
+# ✅ Create blueprint instance
+bp = Blueprint('media', __name__, url_prefix='/media')
+
+# One year: a key is a content hash, so a URL never points at different bytes
+MAX_AGE = 31536000
+
+def _send_immutable(path, mimetype, etag):
+    # conditional=True answers If-None-Match / If-Modified-Since with 304
+    # and serves Range requests as 206 partial content
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=etag, max_age=MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@bp.route('/<key>.<ext>')
+def blob(key, ext):
+    if not blob_store.KEY_RE.match(key):
+        abort(404)
+    path = blob_store.path_for(key)
+    if not os.path.exists(path):
+        abort(404)
+    return _send_immutable(path, blob_store.CONTENT_TYPES.get(ext, 'application/octet-stream'), key)
+
+@bp.route('/<key>/<variant>.<ext>', defaults={'version': None})
+@bp.route('/<key>/<version>/<variant>.<ext>')
+def derivative(key, version, variant, ext):
+    if not blob_store.KEY_RE.match(key) or variant not in image_pipeline.VARIANTS or ext not in image_pipeline.FORMATS:
+        abort(404)
+    if version != image_pipeline.PIPELINE_VERSION:
+        # URL from before a pipeline bump (e.g. in cached markup): not immutable
+        response = redirect(image_pipeline.derivative_url(key, variant, ext))
+        response.cache_control.no_store = True
+        return response
+    path = image_pipeline.derived_path(current_app.config['MEDIA_ROOT'], key, variant, ext)
+    if os.path.exists(path):
+        etag = f'{key}-{image_pipeline.PIPELINE_VERSION}-{variant}-{ext}'
+        return _send_immutable(path, blob_store.CONTENT_TYPES[ext], etag)
+
+    # Not built yet: queue it and send the browser to the original for now
+    source = blob_store.path_for(key)
+    if not os.path.exists(source):
+        abort(404)
+    image_pipeline.schedule([key])
+    with open(source, 'rb') as f:
+        content_type = blob_store.sniff_content_type(f.read(16))
+    response = redirect(blob_store.url(key, content_type))
+    response.cache_control.no_store = True
+    return response
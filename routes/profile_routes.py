@@ -4,6 +4,7 @@ from werkzeug.utils import secure_filename
 import os
 from models import db, User
 from forms.profile import ProfileCompletionForm
+from utils import low_stock
 
 bp = Blueprint('profile', __name__)
 
@@ -182,7 +183,8 @@ def complete_profile():
 @bp.route('/profile')
 @login_required
 def view_profile():
-    return render_template('profile_view.html', user=current_user)
+    return render_template('profile_view.html', user=current_user,
+                           low_stock_products=low_stock.alerts(vendor_id=current_user.id))
 
 @bp.route('/profile/edit', methods=['GET', 'POST'])
 @login_required
@@ -1,84 +1,57 @@
-from flask import Blueprint, render_template, request, url_for, flash, redirect, jsonify
+from flask import Blueprint, render_template, request, url_for, flash, redirect, jsonify, abort
 from flask_login import login_required, current_user
-from models.product_model import Product, Review, ProductImage
-from models.order_model import Cart, Order, OrderItem, Payment
+from models.product_model import Category, Product, Review, ProductImage
+from models.order_model import Order
 from models import db
-from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
 import os
-import base64
-from utils.email_utils import send_email_if_configured
+from utils.email_utils import queue_email
+from utils import blob_store, cart, catalog, conditional, facets, image_pipeline, inventory, orders, sales_rollup
 
 # ✅ Create blueprint instance
 bp = Blueprint('shop', __name__, url_prefix='/shop')
+
+def _catalog_version():
+    # counters updates bump Product.updated_at too, so ratings are covered
+    return (conditional.table_version(Product.updated_at),
+            conditional.table_version(Category.updated_at))
+
+def _product_version(product_id):
+    product = conditional.row_version([Product.updated_at, Product.category_id], Product.id == product_id)
+    if product is None:
+        return None
+    return (product,
+            conditional.table_version(ProductImage.created_at, ProductImage.product_id == product_id),
+            conditional.row_version([Category.updated_at], Category.id == product[1]))
+
 @bp.route('/')
+@conditional.conditional(_catalog_version)
 def index():
     # Filters: q, category, min_price, max_price, rating, sort
     q = request.args.get('q')
     category = request.args.get('category')
     min_price = request.args.get('min_price')
     max_price = request.args.get('max_price')
-    sort = request.args.get('sort')  # price_asc, price_desc, date, popularity
-
-    query = Product.query.filter(Product.is_active == True)
-    if q:
-        query = query.filter((Product.name.ilike(f"%{q}%")) | (Product.description.ilike(f"%{q}%")))
-    if category:
-        query = query.filter(Product.category == category)
-    if min_price:
-        try:
-            query = query.filter(Product.price >= float(min_price))
-        except ValueError:
-            pass
-    if max_price:
-        try:
-            query = query.filter(Product.price <= float(max_price))
-        except ValueError:
-            pass
-
-    products = query.all()
-
-    # calculate average rating and popularity (order items count)
-    prod_ids = [p.id for p in products]
-    ratings = {}
-    if prod_ids:
-        rows = db.session.query(Review.product_id, func.avg(Review.rating)).filter(Review.product_id.in_(prod_ids), Review.is_approved==True).group_by(Review.product_id).all()
-        ratings = {r[0]: float(r[1]) for r in rows}
-
-    # popularity by order items
-    popularity = {}
-    if prod_ids:
-        rows = db.session.query(OrderItem.product_id, func.count(OrderItem.id)).filter(OrderItem.product_id.in_(prod_ids)).group_by(OrderItem.product_id).all()
-        popularity = {r[0]: int(r[1]) for r in rows}
-
-    for p in products:
-        p.avg_rating = ratings.get(p.id, 0)
-        p.popularity = popularity.get(p.id, 0)
-
-    if sort == 'price_asc':
-        products.sort(key=lambda x: x.price)
-    elif sort == 'price_desc':
-        products.sort(key=lambda x: x.price, reverse=True)
-    elif sort == 'popularity':
-        products.sort(key=lambda x: x.popularity, reverse=True)
-    else:  # default date
-        products.sort(key=lambda x: x.created_at, reverse=True)
-
-    # gather categories for filter UI
-    categories = [c[0] for c in db.session.query(Product.category).distinct().all() if c[0]]
-    return render_template("marketplace.html", products=products, categories=categories, q=q, category=category, min_price=min_price, max_price=max_price, sort=sort)
+    sort = request.args.get('sort')  # relevance, price_asc, price_desc, date, popularity, rating
+    after = request.args.get('after')  # keyset cursor from the previous page
+
+    page = catalog.browse(q=q, category=category, min_price=min_price, max_price=max_price, sort=sort, after=after)
+
+    # cached category list with active-product counts for the filter UI
+    categories = facets.categories()
+    return render_template("marketplace.html", products=page.items, page=page, categories=categories, q=q, category=category, min_price=min_price, max_price=max_price, sort=page.sort, after=after)
 
 #View single Product
 @bp.route('/product/<int:product_id>')
+@conditional.conditional(_product_version)
 def view_product(product_id):
     product = Product.query.get_or_404(product_id)
     # Get images from ProductImage table
     product_images = ProductImage.query.filter_by(product_id=product_id).order_by(ProductImage.created_at).all()
-    images = [img.img_data for img in product_images]
-    # approved reviews
-    reviews = [r for r in product.reviews if getattr(r, 'is_approved', True)]
-    avg_rating = None
-    if reviews:
-        avg_rating = sum(r.rating for r in reviews) / len(reviews)
+    images = [img.url for img in product_images]
+    # approved reviews; the average comes from the maintained counters
+    reviews = Review.query.filter_by(product_id=product_id, is_approved=True).order_by(Review.created_at.desc()).all()
+    avg_rating = product.avg_rating if product.review_count else None
 
     return render_template("product_detail.html", product=product, images=images, reviews=reviews, avg_rating=avg_rating)
 
@@ -114,6 +87,8 @@ def add_product():
                 vendor_id=current_user.id
             )
             db.session.add(product)
+            db.session.flush()
+            inventory.record_initial(product, current_user.id)
             db.session.commit()
 
             # Handle multiple image uploads - require at least 2 images
@@ -125,23 +100,27 @@ def add_product():
                 flash('Please upload at least 2 images for the product.', 'danger')
                 return redirect(url_for('shop.add_product'))
 
-            first_img_data = None
+            first_image = None
             for image_file in valid_images:
-                # Convert to base64
-                img_data = base64.b64encode(image_file.read()).decode('utf-8')
-                if first_img_data is None:
-                    first_img_data = img_data
+                # Stream into the content-addressed blob store
+                key, size, content_type = blob_store.put_upload(image_file)
                 product_image = ProductImage(
                     product_id=product.id,
-                    img_data=img_data
+                    blob_key=key,
+                    content_type=content_type,
+                    byte_size=size
                 )
+                if first_image is None:
+                    first_image = product_image
                 db.session.add(product_image)
-            db.session.commit()
 
             # Set primary image URL to first image
-            if first_img_data:
-                product.img_url = f"data:image/jpeg;base64,{first_img_data}"
-                db.session.commit()
+            if first_image:
+                product.img_url = first_image.url
+            db.session.commit()
+
+            # Thumbnails and WebP variants are built off the request thread
+            image_pipeline.schedule([img.blob_key for img in product.images])
 
             flash('Product added successfully!', 'success')
             return redirect(url_for('shop.view_product', product_id=product.id))
@@ -173,8 +152,8 @@ def add_review(product_id):
     
     return redirect(url_for('shop.view_product', product_id=product.id))
 
+# Cart changes stay in the session and are written behind (utils.cart)
 @bp.route('/cart/add', methods=['POST'])
-@login_required
 def add_to_cart():
     data = request.get_json()
     product_id = data.get('product_id')
@@ -182,111 +161,91 @@ def add_to_cart():
     
     try:
         product = Product.query.get_or_404(product_id)
-        if not product.in_stock or product.quantity < quantity:
+        # if an item exists, add to its quantity
+        new_quantity = cart.quantity(product.id) + quantity
+        if not product.in_stock or not product.is_active or cart.available(product) < new_quantity:
             return jsonify({'success': False, 'error': 'Not enough stock'})
 
-        # if an item exists, update quantity
-        cart_item = Cart.query.filter_by(user_id=current_user.id, product_id=product_id).first()
-        if cart_item:
-            cart_item.quantity = min(product.quantity, cart_item.quantity + quantity)
-        else:
-            cart_item = Cart(user_id=current_user.id, product_id=product_id, quantity=quantity)
-            db.session.add(cart_item)
-
-        db.session.commit()
+        if not cart.set_quantity(product.id, new_quantity):
+            return jsonify({'success': False, 'error': 'Not enough stock'})
         return jsonify({'success': True})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)})
 
 @bp.route('/cart')
-@login_required
 def view_cart():
-    cart_items = Cart.query.filter_by(user_id=current_user.id).all()
-    subtotal = sum(item.product.price * item.quantity for item in cart_items)
-    return render_template('cart.html', cart_items=cart_items, subtotal=subtotal)
+    summary = cart.summary()
+    return render_template('cart.html', cart_items=summary.lines, subtotal=summary.subtotal)
+
+@bp.route('/cart/summary.json')
+def cart_summary():
+    # polled by the navbar mini-cart; cached until the cart changes
+    response = jsonify(cart.cached_summary())
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @bp.route('/cart/update/<int:item_id>', methods=['POST'])
-@login_required
 def update_cart(item_id):
+    # item_id is the product id of the cart line
     data = request.get_json()
     action = data.get('action')
     
-    cart_item = Cart.query.filter_by(id=item_id, user_id=current_user.id).first_or_404()
+    quantity = cart.quantity(item_id)
+    if not quantity:
+        abort(404)
     
     if action == 'increase':
-        cart_item.quantity += 1
+        product = Product.query.get_or_404(item_id)
+        if cart.available(product) < quantity + 1:
+            return jsonify({'success': False, 'error': 'Not enough stock'})
+        if not cart.set_quantity(item_id, quantity + 1):
+            return jsonify({'success': False, 'error': 'Not enough stock'})
     elif action == 'decrease':
-        if cart_item.quantity > 1:
-            cart_item.quantity -= 1
-        else:
-            db.session.delete(cart_item)
-            db.session.commit()
-            return jsonify({'success': True})
+        cart.set_quantity(item_id, quantity - 1)
     
-    db.session.commit()
     return jsonify({'success': True})
 
 @bp.route('/cart/remove/<int:item_id>', methods=['POST'])
-@login_required
 def remove_from_cart(item_id):
-    cart_item = Cart.query.filter_by(id=item_id, user_id=current_user.id).first_or_404()
-    db.session.delete(cart_item)
-    db.session.commit()
+    if not cart.quantity(item_id):
+        abort(404)
+    cart.set_quantity(item_id, 0)
     return jsonify({'success': True})
 
 @bp.route('/checkout', methods=['GET', 'POST'])
 @login_required
 def checkout():
     # Show checkout form with address information
-    cart_items = Cart.query.filter_by(user_id=current_user.id).all()
+    summary = cart.summary()
+    cart_items = summary.lines
     if not cart_items:
         flash('Your cart is empty', 'warning')
         return redirect(url_for('shop.index'))
 
-    subtotal = sum(item.product.price * item.quantity for item in cart_items)
     if request.method == 'POST':
         # collect address fields
         address = request.form.get('address') or current_user.address
         shipping_address = address
 
-        # create order
-        order = Order(user_id=current_user.id, total_amount=subtotal, status='pending', shipping_address=shipping_address)
-        db.session.add(order)
-        db.session.commit()
-
-        # create order items and reduce inventory
-        for item in cart_items:
-            oi = OrderItem(order_id=order.id, product_id=item.product_id, quantity=item.quantity, price=item.product.price)
-            db.session.add(oi)
-            # decrement product stock
-            p = item.product
-            try:
-                p.quantity = max(0, p.quantity - item.quantity)
-                if p.quantity == 0:
-                    p.in_stock = False
-            except Exception:
-                pass
-
-        # create payment record placeholder
-        payment = Payment(order_id=order.id, amount=subtotal, status='pending')
-        db.session.add(payment)
-
-        # clear cart
-        Cart.query.filter_by(user_id=current_user.id).delete()
-
-        db.session.commit()
-
-        # send confirmation email if configured
+        # order, items, stock and cart change together in one transaction
         try:
-            send_email_if_configured(current_user.email, 'Order placed', f'Your order #{order.id} was placed. Total: {subtotal}')
-        except Exception:
-            pass
+            cart.flush(replace=True)
+            order = orders.place_order(current_user.id, shipping_address, confirm_to=current_user.email)
+        except orders.OutOfStock as e:
+            flash(f"Not enough stock left for: {', '.join(e.product_names)}. Please update your cart.", 'danger')
+            return redirect(url_for('shop.view_cart'))
+        except OperationalError:
+            flash('The shop is busy right now, please try again.', 'warning')
+            return redirect(url_for('shop.checkout'))
+        if order is None:
+            flash('Your cart is empty', 'warning')
+            return redirect(url_for('shop.index'))
+        cart.clear()
 
         return redirect(url_for('shop.payment', order_id=order.id))
 
-    subtotal = sum(item.product.price * item.quantity for item in cart_items)
-    return render_template('checkout.html', cart_items=cart_items, subtotal=subtotal)
+    return render_template('checkout.html', cart_items=cart_items, subtotal=summary.subtotal)
 
 
 @bp.route('/payment/<int:order_id>')
@@ -303,13 +262,10 @@ def payment(order_id):
 def complete_payment(order_id):
     order = Order.query.get_or_404(order_id)
     # mark paid (in real app verify via gateway)
-    order.payment_status = 'paid'
-    order.status = 'confirmed'
+    sales_rollup.set_status(order, status='confirmed', payment_status='paid')
+    # queued with the status change; sent by the outbox worker
+    queue_email(order.user.email, 'Payment received', f'Payment received for order #{order.id}. Thank you!')
     db.session.commit()
-    try:
-        send_email_if_configured(order.user.email, 'Payment received', f'Payment received for order #{order.id}. Thank you!')
-    except Exception:
-        pass
     flash('Payment completed. Order confirmed.', 'success')
     return redirect(url_for('shop.index'))
         
\ No newline at end of file
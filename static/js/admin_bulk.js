@@ -0,0 +1,68 @@
+// Admin bulk actions: tick rows (.bulk-select), pick an action in the
+// [data-bulk-target] bar and every ticked id is sent to /admin/bulk as one
+// request. The page reloads afterwards to show the new state.
+(function () {
+  const bar = document.querySelector('[data-bulk-target]');
+  if (!bar) {
+    return;
+  }
+  const boxes = () => Array.from(document.querySelectorAll('.bulk-select'));
+  const count = bar.querySelector('[data-bulk-count]');
+
+  function selectedIds() {
+    return boxes().filter(box => box.checked).map(box => Number(box.value));
+  }
+
+  function updateCount() {
+    const n = selectedIds().length;
+    if (count) {
+      count.textContent = n;
+    }
+    bar.querySelectorAll('[data-bulk-action]').forEach(button => { button.disabled = !n; });
+  }
+
+  const all = document.querySelector('.bulk-select-all');
+  if (all) {
+    all.addEventListener('change', () => {
+      boxes().forEach(box => { box.checked = all.checked; });
+      updateCount();
+    });
+  }
+  boxes().forEach(box => box.addEventListener('change', updateCount));
+
+  bar.querySelectorAll('[data-bulk-action]').forEach(button => {
+    button.addEventListener('click', () => {
+      const ids = selectedIds();
+      const action = button.dataset.bulkAction;
+      const role = bar.querySelector('[data-bulk-role]');
+      if (!ids.length || !confirm(`Apply "${button.textContent.trim()}" to ${ids.length} row(s)?`)) {
+        return;
+      }
+      fetch(bar.dataset.bulkUrl, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          target: bar.dataset.bulkTarget,
+          action,
+          ids,
+          role: action === 'set_role' && role ? role.value : undefined,
+        }),
+      })
+        .then(response => response.json())
+        .then(data => {
+          if (!data.success) {
+            alert('Failed: ' + (data.error || 'unknown'));
+            return;
+          }
+          const skipped = Object.values(data.results).filter(r => r !== 'updated').length;
+          if (skipped) {
+            alert(`${data.updated} updated, ${skipped} not changed.`);
+          }
+          window.location.reload();
+        })
+        .catch(() => alert('Error'));
+    });
+  });
+  updateCount();
+})();
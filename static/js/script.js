@@ -0,0 +1,26 @@
+// Navbar mini-cart: the count comes from /shop/cart/summary.json so pages
+// themselves stay cacheable. Pages fire "cart:changed" after editing the cart.
+(function () {
+  const badge = document.querySelector('[data-cart-count]');
+  if (!badge) {
+    return;
+  }
+
+  function refreshCartCount() {
+    fetch(badge.dataset.summaryUrl, { credentials: 'same-origin' })
+      .then(response => response.json())
+      .then(data => {
+        badge.textContent = data.count;
+        badge.classList.toggle('d-none', !data.count);
+      })
+      .catch(() => {});
+  }
+
+  document.addEventListener('cart:changed', refreshCartCount);
+  document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'visible') {
+      refreshCartCount();
+    }
+  });
+  refreshCartCount();
+})();
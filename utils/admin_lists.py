@@ -0,0 +1,176 @@
+"""Queries behind the admin list views.
+
+The admin tables grow without bound, so none of them load a whole table:
+pages are addressed with keyset cursors (``?after=``, the same format as
+the marketplace in ``utils.catalog``), related rows are eager-loaded, and
+per-row aggregates are fetched with one grouped query per page. Filters
+live here so exports and other tools can apply exactly what the list view
+shows.
+"""
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import joinedload, load_only
+
+from models import db
+from models.order_model import Order, OrderItem
+from models.product_model import Product, Review
+from models.user_model import User
+from utils import facets, search
+from utils.catalog import decode_cursor, encode_cursor
+
+ORDER_STATUSES = ('pending', 'confirmed', 'shipped', 'delivered', 'cancelled')
+ORDERS_PER_PAGE = 50
+USER_ROLES = ('customer', 'farmer', 'vendor', 'consultant', 'admin')
+USERS_PER_PAGE = 50
+# sort name -> (column, descending, cursor value type)
+USER_SORTS = {
+    'newest': (User.created_at, True, datetime),
+    'oldest': (User.created_at, False, datetime),
+    'role': (User.role, False, str),
+}
+# what the user table shows; the Text profile columns are never loaded
+USER_LIST_COLUMNS = (User.id, User.name, User.email, User.role, User.is_verified, User.is_active,
+                     User.location, User.created_at)
+
+REVIEW_STATUSES = ('pending', 'approved')
+REVIEWS_PER_PAGE = 50
+
+OrderTotals = namedtuple('OrderTotals', 'item_count units items_total')
+
+
+class ListPage:
+    """One page of rows plus the cursor for the next one."""
+
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def filter_orders(query, status=None, q=None):
+    """Apply the admin order filters (status, customer email) to a query."""
+    if status:
+        query = query.filter(Order.status == status)
+    if q:
+        # resolve matching customers first so orders are found via (user_id, created_at)
+        customers = select(User.id).where(User.email.ilike(f"%{q}%"))
+        query = query.filter(Order.user_id.in_(customers))
+    return query
+
+
+def filter_products(query, q=None, category=None, status=None):
+    """Apply the admin product filters (name search, category, active) to a query."""
+    query = search.filter_query(query, q, fields=('name',))
+    query = facets.filter_category(query, category)
+    if status == 'active':
+        query = query.filter(Product.is_active == True)
+    elif status == 'disabled':
+        query = query.filter(Product.is_active == False)
+    return query
+
+
+def filter_users(query, q=None, role=None):
+    """Apply the admin user filters (name/email/role/location search, role) to a query."""
+    if q:
+        pattern = f"%{q}%"
+        query = query.filter(or_(User.email.ilike(pattern), User.name.ilike(pattern),
+                                 User.role.ilike(pattern), User.location.ilike(pattern)))
+    if role:
+        query = query.filter(User.role == role)
+    return query
+
+
+def order_page(status=None, q=None, after=None, per_page=ORDERS_PER_PAGE):
+    """Newest-first page of orders with their customers loaded."""
+    query = filter_orders(Order.query.options(joinedload(Order.user)), status, q)
+    position = decode_cursor(after, 'orders', datetime)
+    if position is not None:
+        created_at, last_id = position
+        query = query.filter(or_(Order.created_at < created_at,
+                                 and_(Order.created_at == created_at, Order.id < last_id)))
+    rows = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        next_cursor = encode_cursor('orders', items[-1].created_at, items[-1].id)
+    return ListPage(items, next_cursor)
+
+
+def user_page(q=None, role=None, sort=None, after=None, per_page=USERS_PER_PAGE):
+    """One page of users in ``USER_SORTS`` order, loading only the listed columns."""
+    if sort not in USER_SORTS:
+        sort = 'newest'
+    column, descending, value_type = USER_SORTS[sort]
+    query = filter_users(User.query.options(load_only(*USER_LIST_COLUMNS)), q, role)
+    position = decode_cursor(after, f'users-{sort}', value_type)
+    if position is not None:
+        value, last_id = position
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, User.id < last_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, User.id > last_id)))
+    order = (column.desc(), User.id.desc()) if descending else (column.asc(), User.id.asc())
+    rows = query.order_by(*order).limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(f'users-{sort}', getattr(last, column.key), last.id)
+    return ListPage(items, next_cursor)
+
+
+def review_page(status='pending', after=None, per_page=REVIEWS_PER_PAGE):
+    """Oldest-first page of pending (or approved) reviews with product and author loaded."""
+    if status not in REVIEW_STATUSES:
+        status = 'pending'
+    query = (Review.query
+             .options(joinedload(Review.product).load_only(Product.id, Product.name),
+                      joinedload(Review.user).load_only(User.id, User.name, User.email))
+             .filter(Review.is_approved == (status == 'approved')))
+    position = decode_cursor(after, f'reviews-{status}', datetime)
+    if position is not None:
+        created_at, last_id = position
+        query = query.filter(or_(Review.created_at > created_at,
+                                 and_(Review.created_at == created_at, Review.id > last_id)))
+    rows = query.order_by(Review.created_at.asc(), Review.id.asc()).limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        next_cursor = encode_cursor(f'reviews-{status}', items[-1].created_at, items[-1].id)
+    return ListPage(items, next_cursor)
+
+
+def pending_review_count():
+    """Reviews waiting for moderation, counted from the (is_approved, created_at) index."""
+    return db.session.query(func.count(Review.id)).filter(Review.is_approved == False).scalar()
+
+
+def user_role_counts(q=None):
+    """{role: user count} for the search filter, from one GROUP BY."""
+    query = filter_users(db.session.query(User.role, func.count(User.id)), q=q)
+    return dict(query.group_by(User.role).all())
+
+
+def order_totals(orders):
+    """{order_id: OrderTotals} for the given orders, from one GROUP BY."""
+    ids = [o.id for o in orders]
+    if not ids:
+        return {}
+    rows = (db.session.query(OrderItem.order_id,
+                             func.count(OrderItem.id),
+                             func.coalesce(func.sum(OrderItem.quantity), 0),
+                             func.coalesce(func.sum(OrderItem.quantity * OrderItem.price), 0.0))
+            .filter(OrderItem.order_id.in_(ids))
+            .group_by(OrderItem.order_id))
+    return {order_id: OrderTotals(count, units, total) for order_id, count, units, total in rows}
+
+
+def order_status_counts(q=None):
+    """{status: order count} for the customer filter, from one GROUP BY."""
+    query = filter_orders(db.session.query(Order.status, func.count(Order.id)), q=q)
+    return dict(query.group_by(Order.status).all())
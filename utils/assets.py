@@ -0,0 +1,301 @@
+"""Build-time static asset pipeline.
+
+``manage.py build-assets`` does two passes over ``static/``:
+
+* ``build_images`` resizes everything under ``static/images`` into width
+  ladders in AVIF, WebP and the source format (``static/build/images``,
+  manifest ``images.json``).
+* ``build_static`` copies every static file, the ladders included, to a
+  content-hashed name under ``static/build/assets`` with ``.gz``/``.br``
+  siblings for text assets (manifest ``manifest.json``). CSS ``url()``
+  references are rewritten to the hashed names.
+
+Templates resolve logical names with ``asset_url()``, a drop-in for
+``url_for('static', filename=...)``, and render the image ladders with
+``static_picture()`` (a ``<picture>`` with ``srcset`` and width/height
+hints) and ``static_image_set()`` (a CSS ``image-set()``). Everything falls
+back to the untouched originals under /static when nothing has been built.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from flask import current_app, url_for
+from markupsafe import Markup, escape
+
+try:
+    import brotli
+except ImportError:  # optional: without it only .gz siblings are written
+    brotli = None
+
+BUILD_DIR = 'build'
+IMAGE_MANIFEST = 'images.json'
+ASSET_MANIFEST = 'manifest.json'
+ASSET_DIR = BUILD_DIR + '/assets'
+
+# Never fingerprinted: user uploads and the pipeline's own output/manifests
+ASSET_EXCLUDE = ('uploads/', ASSET_DIR + '/', f'{BUILD_DIR}/{IMAGE_MANIFEST}', f'{BUILD_DIR}/{ASSET_MANIFEST}')
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.ico')
+HASH_LENGTH = 10
+
+_CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+IMAGE_SOURCE_DIR = 'images'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+IMAGE_WIDTHS = (480, 960, 1440, 1920)
+
+# output extension -> (Pillow format, save options, MIME type); order is
+# the <source> order, best compression first
+IMAGE_FORMATS = {
+    'avif': ('AVIF', {'quality': 50}, 'image/avif'),
+    'webp': ('WEBP', {'quality': 75, 'method': 6}, 'image/webp'),
+    'jpg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}, 'image/jpeg'),
+    'png': ('PNG', {'optimize': True}, 'image/png'),
+}
+
+_manifest_cache = {}
+
+
+def init_app(app):
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.jinja_env.globals['static_picture'] = static_picture
+    app.jinja_env.globals['static_image_set'] = static_image_set
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as tmp:
+        tmp.write(data)
+    os.replace(tmp_path, path)
+
+
+def _available_formats():
+    from PIL import features
+    formats = []
+    for ext in IMAGE_FORMATS:
+        if ext == 'avif' and not features.check('avif'):
+            continue
+        if ext == 'webp' and not features.check('webp'):
+            continue
+        formats.append(ext)
+    return formats
+
+
+def build_images(static_folder, log=print):
+    """Write resized ladders for static/images and return the manifest."""
+    from io import BytesIO
+    from PIL import Image, ImageOps
+
+    formats = _available_formats()
+    if 'avif' not in formats:
+        log('Pillow has no AVIF support; skipping AVIF variants.')
+
+    source_dir = os.path.join(static_folder, IMAGE_SOURCE_DIR)
+    manifest = {}
+    for dirpath, _, filenames in os.walk(source_dir):
+        for filename in sorted(filenames):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            source = os.path.join(dirpath, filename)
+            logical = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            stem, ext = os.path.splitext(logical)
+            fallback = 'png' if ext.lower() == '.png' else 'jpg'
+
+            with Image.open(source) as img:
+                img = ImageOps.exif_transpose(img)
+                img.load()
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            widths = [w for w in IMAGE_WIDTHS if w < img.width]
+            if img.width <= IMAGE_WIDTHS[-1]:
+                widths.append(img.width)
+            entry = {'width': img.width, 'height': img.height, 'fallback': fallback, 'variants': {}}
+            for fmt in formats:
+                if fmt in ('jpg', 'png') and fmt != fallback:
+                    continue
+                pil_format, options, _ = IMAGE_FORMATS[fmt]
+                variants = []
+                for width in widths:
+                    out = img
+                    if width < img.width:
+                        out = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+                    if fmt == 'jpg' and out.mode not in ('RGB', 'L'):
+                        out = out.convert('RGB')
+                    name = f'{BUILD_DIR}/{stem}-{width}.{fmt}'
+                    buf = BytesIO()
+                    out.save(buf, pil_format, **options)
+                    _write_atomic(os.path.join(static_folder, name), buf.getvalue())
+                    variants.append([width, name])
+                entry['variants'][fmt] = variants
+            manifest[logical] = entry
+            log(f'{logical}: {len(widths)} width(s) x {len(entry["variants"])} format(s)')
+
+    _write_atomic(os.path.join(static_folder, BUILD_DIR, IMAGE_MANIFEST),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    _manifest_cache.clear()
+    return manifest
+
+
+def _hashed_name(logical, data):
+    stem, ext = os.path.splitext(logical)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def _rewrite_css_urls(logical, css, mapping):
+    """Point relative url()s in a stylesheet at their hashed copies."""
+    css_dir = os.path.dirname(logical)
+    out_dir = os.path.dirname(f'{ASSET_DIR}/{logical}')
+
+    def replace(match):
+        quote, ref = match.groups()
+        if ref.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        path, _, suffix = ref.partition('?')
+        target = os.path.normpath(os.path.join(css_dir, path)).replace(os.sep, '/')
+        if target not in mapping:
+            return match.group(0)
+        rel = os.path.relpath(mapping[target], out_dir).replace(os.sep, '/')
+        return f'url({quote}{rel}{"?" + suffix if suffix else ""}{quote})'
+
+    return _CSS_URL_RE.sub(replace, css)
+
+
+def _write_compressed(path, data):
+    """Write .gz (and .br) siblings, but only when they are smaller."""
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        _write_atomic(path + '.gz', gz)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            _write_atomic(path + '.br', br)
+
+
+def build_static(static_folder, log=print):
+    """Fingerprint every static file and return the logical -> hashed map."""
+    if brotli is None:
+        log('brotli is not installed; writing .gz siblings only.')
+
+    sources = []
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.startswith('.') or filename.endswith(('.gz', '.br')):
+                continue
+            logical = os.path.relpath(os.path.join(dirpath, filename), static_folder).replace(os.sep, '/')
+            if logical.startswith(ASSET_EXCLUDE):
+                continue
+            sources.append(logical)
+
+    # Stylesheets last, so the files they reference already have hashed names
+    sources.sort(key=lambda name: name.endswith('.css'))
+    mapping = {}
+    for logical in sources:
+        with open(os.path.join(static_folder, logical), 'rb') as f:
+            data = f.read()
+        if logical.endswith('.css'):
+            data = _rewrite_css_urls(logical, data.decode('utf-8'), mapping).encode('utf-8')
+        hashed = f'{ASSET_DIR}/{_hashed_name(logical, data)}'
+        out_path = os.path.join(static_folder, hashed)
+        if not os.path.exists(out_path):
+            _write_atomic(out_path, data)
+            if logical.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                _write_compressed(out_path, data)
+        mapping[logical] = hashed
+
+    _write_atomic(os.path.join(static_folder, BUILD_DIR, ASSET_MANIFEST),
+                  json.dumps(mapping, indent=2, sort_keys=True).encode('utf-8'))
+    _manifest_cache.clear()
+    log(f'Fingerprinted {len(mapping)} static file(s).')
+    return mapping
+
+
+def _load_manifest(name):
+    """Read a build manifest, re-reading it only when the file changes."""
+    path = os.path.join(current_app.static_folder, BUILD_DIR, name)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    cached = _manifest_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    _manifest_cache[path] = (mtime, data)
+    return data
+
+
+def image_manifest():
+    return _load_manifest(IMAGE_MANIFEST)
+
+
+def asset_url(filename, **values):
+    """``url_for('static', filename=...)`` that prefers the hashed copy."""
+    hashed = _load_manifest(ASSET_MANIFEST).get(filename)
+    if hashed:
+        return url_for('assets.serve', filename=hashed[len(ASSET_DIR) + 1:], **values)
+    return url_for('static', filename=filename, **values)
+
+
+def _srcset(variants):
+    return ', '.join(f"{asset_url(name)} {width}w" for width, name in variants)
+
+
+def static_picture(filename, alt='', sizes='100vw', lazy=True, **attrs):
+    """Render a static image as a responsive <picture>.
+
+    ``lazy=False`` is for above-the-fold images: it drops
+    ``loading="lazy"`` and asks for high fetch priority instead.
+    """
+    attrs.setdefault('loading', 'lazy' if lazy else None)
+    attrs.setdefault('fetchpriority', None if lazy else 'high')
+    attrs.setdefault('decoding', 'async')
+    entry = image_manifest().get(filename)
+    if entry:
+        attrs.setdefault('width', entry['width'])
+        attrs.setdefault('height', entry['height'])
+    extra = ''.join(
+        f' {escape(name.rstrip("_").replace("_", "-"))}="{escape(value)}"'
+        for name, value in attrs.items() if value is not None
+    )
+    if not entry:
+        return Markup(f'<img src="{escape(asset_url(filename))}" alt="{escape(alt)}"{extra}>')
+
+    variants = entry['variants']
+    fallback = variants[entry['fallback']]
+    # Default <img src>: the largest fallback no wider than 1440px
+    src = next((name for width, name in reversed(fallback) if width <= 1440), fallback[0][1])
+    sources = ''.join(
+        f'<source type="{IMAGE_FORMATS[fmt][2]}" srcset="{escape(_srcset(variants[fmt]))}" sizes="{escape(sizes)}">'
+        for fmt in ('avif', 'webp') if fmt in variants
+    )
+    return Markup(
+        f'<picture>{sources}'
+        f'<img src="{escape(asset_url(src))}" srcset="{escape(_srcset(fallback))}"'
+        f' sizes="{escape(sizes)}" alt="{escape(alt)}"{extra}>'
+        '</picture>'
+    )
+
+
+def static_image_set(filename, width=1440):
+    """CSS ``image-set()`` of the built variants closest to ``width``.
+
+    Returns an empty string when the image has not been built, so templates
+    can leave the stylesheet's own url() in charge.
+    """
+    entry = image_manifest().get(filename)
+    if not entry:
+        return ''
+    candidates = []
+    for fmt in ('avif', 'webp', entry['fallback']):
+        if fmt not in entry['variants']:
+            continue
+        fitting = [name for w, name in entry['variants'][fmt] if w <= width] or [entry['variants'][fmt][0][1]]
+        # single quotes: the result is placed inside a style="" attribute
+        candidates.append(f"url('{asset_url(fitting[-1])}') type('{IMAGE_FORMATS[fmt][2]}')")
+    return Markup(f'image-set({", ".join(candidates)})')
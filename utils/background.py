@@ -0,0 +1,63 @@
+"""Periodic background jobs.
+
+Modules register jobs at startup with ``register(app, name, interval, fn)``.
+They are started on the first request rather than in ``create_app``, so
+CLI commands and migrations (which build the app too) never spawn them.
+Each job runs ``fn()`` inside an app context on its own daemon thread every
+``interval`` seconds; an exception is logged and the loop carries on.
+"""
+import threading
+
+from models import db
+
+
+def init_app(app):
+    app.extensions['background'] = {
+        'jobs': [],
+        'threads': [],
+        'started': False,
+        'lock': threading.Lock(),
+        'stop': threading.Event(),
+    }
+    app.before_request(lambda: _start(app))
+
+
+def register(app, name, interval, fn):
+    """Run ``fn()`` every ``interval`` seconds; a falsy interval disables it."""
+    if interval:
+        app.extensions['background']['jobs'].append((name, interval, fn))
+
+
+def _run(app, name, interval, fn, stop):
+    while not stop.wait(interval):
+        with app.app_context():
+            try:
+                fn()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Background job %s failed', name)
+            finally:
+                db.session.remove()
+
+
+def _start(app):
+    state = app.extensions['background']
+    if state['started']:
+        return
+    with state['lock']:
+        if state['started']:
+            return
+        for name, interval, fn in state['jobs']:
+            thread = threading.Thread(target=_run, args=(app, name, interval, fn, state['stop']),
+                                      name=f'bg-{name}', daemon=True)
+            thread.start()
+            state['threads'].append(thread)
+        state['started'] = True
+
+
+def stop(app, timeout=5):
+    """Ask every job to finish and wait for the threads."""
+    state = app.extensions['background']
+    state['stop'].set()
+    for thread in state['threads']:
+        thread.join(timeout)
@@ -0,0 +1,135 @@
+"""Set-based admin actions on many rows at once.
+
+``apply(target, action, ids)`` turns one admin action (verify, activate,
+change role, ...) on N ids into a single ``UPDATE ... WHERE id IN (...)
+RETURNING id`` in one transaction, and reports per id whether it was
+updated, not found, invalid or skipped. Review moderation also moves the
+product rating counters, so its actions are functions from
+``utils.product_stats`` that run their own set-based statements. After the
+commit ``rows_updated`` is sent once for the whole batch with the table
+name and the updated ids; ``utils.fragment_cache`` listens to drop the
+cached markup of those rows.
+"""
+from flask.signals import Namespace
+from sqlalchemy import select, update
+
+from models import db
+from models.consultant_model import Consultant
+from models.product_model import Product, Review
+from models.user_model import User
+from utils import low_stock, product_stats
+from utils.admin_lists import USER_ROLES
+
+MAX_IDS = 1000
+
+_signals = Namespace()
+# sender: table name; keyword ``ids``: the ids that were updated
+rows_updated = _signals.signal('rows-updated')
+
+# target -> (model, {action: SET values, or a function of the ids returning the ids it changed})
+TARGETS = {
+    'users': (User, {
+        'verify': {User.is_verified: True},
+        'unverify': {User.is_verified: False},
+        'activate': {User.is_active: True},
+        'deactivate': {User.is_active: False},
+        'set_role': None,  # values built from ``role``
+    }),
+    'products': (Product, {
+        'activate': {Product.is_active: True},
+        'deactivate': {Product.is_active: False},
+        'toggle': {Product.is_active: ~Product.is_active},
+    }),
+    'consultants': (Consultant, {
+        'verify': {Consultant.is_verified: True},
+        'unverify': {Consultant.is_verified: False},
+        'activate': {Consultant.is_active: True},
+        'deactivate': {Consultant.is_active: False},
+    }),
+    'reviews': (Review, {
+        'approve': product_stats.approve_reviews,
+        'reject': product_stats.reject_reviews,  # deletes
+    }),
+}
+# actions an admin may not apply to their own account
+_SELF_PROTECTED = {('users', 'deactivate'), ('users', 'set_role')}
+
+
+class BulkActionError(ValueError):
+    """Unknown target or action, bad role, or too many ids."""
+
+
+def _values(target, action, role):
+    if target not in TARGETS:
+        raise BulkActionError(f'unknown target: {target!r}')
+    model, actions = TARGETS[target]
+    if action not in actions:
+        raise BulkActionError(f'unknown action for {target}: {action!r}')
+    if action == 'set_role':
+        if role not in USER_ROLES:
+            raise BulkActionError(f'invalid role: {role!r}')
+        return model, {User.role: role}
+    return model, actions[action]
+
+
+def apply(target, action, ids, role=None, actor_id=None):
+    """Apply ``action`` to every row of ``target`` in ``ids`` and commit.
+
+    Returns ``{id: 'updated' | 'not_found' | 'invalid' | 'skipped'}``, keyed
+    by the ids as given (as strings). Rows that exist but were left alone
+    are skipped: a review that is already approved, and the row matching
+    ``actor_id`` (the admin's own user id) for actions that would lock the
+    admin out. Raises BulkActionError before touching the database if the
+    request itself is bad.
+    """
+    model, values = _values(target, action, role)
+    if not isinstance(ids, (list, tuple)):
+        raise BulkActionError('ids must be a list')
+    if len(ids) > MAX_IDS:
+        raise BulkActionError(f'at most {MAX_IDS} ids per request')
+
+    results = {}
+    wanted = set()
+    for raw in ids:
+        key = str(raw)
+        try:
+            row_id = int(raw)
+        except (TypeError, ValueError):
+            results[key] = 'invalid'
+            continue
+        if (target, action) in _SELF_PROTECTED and row_id == actor_id:
+            results[key] = 'skipped'
+            continue
+        wanted.add(row_id)
+        results[key] = row_id
+
+    updated = set()
+    existing = set()
+    if wanted:
+        try:
+            if callable(values):
+                updated = set(values(wanted))
+                # rows the action did not apply to, as opposed to missing ones
+                if wanted - updated:
+                    existing = set(db.session.execute(
+                        select(model.id).where(model.id.in_(wanted - updated))).scalars())
+            else:
+                updated = set(db.session.execute(
+                    update(model).where(model.id.in_(wanted)).values(values).returning(model.id)
+                ).scalars())
+            if model is Product:
+                low_stock.touch(updated)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if updated:
+            rows_updated.send(model.__tablename__, ids=sorted(updated))
+
+    for key, outcome in results.items():
+        if isinstance(outcome, int):
+            if outcome in updated:
+                results[key] = 'updated'
+            else:
+                results[key] = 'skipped' if outcome in existing else 'not_found'
+    return results
@@ -0,0 +1,259 @@
+"""Session-backed shopping cart with write-behind to the ``Cart`` table.
+
+The live cart is a small ``{product_id: quantity}`` map in the signed
+session cookie, and every worker sees the same cart. When a signed-in
+user's line grows past what is already held for it, the stock hold (see
+``utils.reservations``) is taken and committed at once, so the hold
+guarantee never waits for a flush. Everything else is written behind:
+lines changed since the last write are tracked as dirty, and ``flush()``
+saves their ``Cart`` rows and sets their holds to match, which releases
+the units of lines that shrank. It runs:
+
+* after a shop request, at most once every ``CART_FLUSH_INTERVAL`` seconds
+  (the first change is written straight away, so only bursts of clicks are
+  coalesced). Only shop requests run it, so it adds no ``Vary: Cookie`` to
+  static, asset and media responses;
+* at checkout, where it replaces all of the user's ``Cart`` rows with the
+  session cart, so lines saved from another session are not ordered;
+* on logout, before the cart leaves the session.
+
+``summary()`` reads the cart's products in one narrow query, and
+``cached_summary()`` keeps the mini-cart figures in the fragment cache
+under the session cart's token. Every change gives the cart a new token,
+so the old entry misses in every worker, not just the one that dropped it.
+
+Anonymous visitors get a cart too. It is never written to the database;
+on login it is merged into the user's saved cart (quantities add up).
+"""
+import json
+import time
+import uuid
+from collections import namedtuple
+
+from flask import current_app, request, session
+from flask_login import current_user, user_logged_in, user_logged_out
+from sqlalchemy import case, delete, func, insert, select
+
+from models import db
+from models.order_model import Cart
+from models.product_model import Category, Product
+from utils import fragment_cache, reservations
+
+SESSION_KEY = 'cart'
+
+# What the cart templates iterate over; ``id`` is the product id and
+# ``product`` carries only the columns the cart pages need
+CartProduct = namedtuple('CartProduct', 'id name price quantity in_stock img_url category')
+CartLine = namedtuple('CartLine', 'id product quantity line_total')
+CartSummary = namedtuple('CartSummary', 'lines count subtotal')
+
+
+def init_app(app):
+    app.after_request(_flush_if_due)
+    user_logged_in.connect(_merge_on_login, app)
+    user_logged_out.connect(_flush_on_logout, app)
+
+
+def _saved_items(user_id):
+    rows = (db.session.query(Cart.product_id, func.sum(Cart.quantity))
+            .filter(Cart.user_id == user_id)
+            .group_by(Cart.product_id))
+    return {str(product_id): int(quantity) for product_id, quantity in rows if quantity}
+
+
+def _new_state(owner, items=None, dirty=()):
+    # flushed=0: the first change is written at once, later ones are batched
+    return {'owner': owner, 'items': items or {}, 'dirty': sorted(dirty), 'held': {}, 'flushed': 0,
+            'token': uuid.uuid4().hex}
+
+
+def _adopt(user_id, state):
+    """Start a user's session cart: saved lines plus any guest lines."""
+    guest = state['items'] if state and state.get('owner') is None else {}
+    merged = _saved_items(user_id)
+    for pid, quantity in guest.items():
+        merged[pid] = merged.get(pid, 0) + quantity
+    return _new_state(user_id, merged, guest)
+
+
+def _state():
+    """The session cart, loaded from the database on first use after login."""
+    owner = current_user.id if current_user.is_authenticated else None
+    state = session.get(SESSION_KEY)
+    if state is None or state.get('owner') != owner:
+        state = _adopt(owner, state) if owner else _new_state(None)
+        session[SESSION_KEY] = state
+    elif 'token' not in state:
+        state['token'] = uuid.uuid4().hex
+        session.modified = True
+    return state
+
+
+def items():
+    """{product_id: quantity} for the current visitor."""
+    return {int(pid): quantity for pid, quantity in _state()['items'].items()}
+
+
+def quantity(product_id):
+    return _state()['items'].get(str(product_id), 0)
+
+
+def set_quantity(product_id, quantity):
+    """Set a line's quantity (0 removes it).
+
+    For a signed-in user a line that grows past its hold has the hold
+    raised and committed now; everything else is persisted on the next
+    flush. Returns False, changing nothing, if the hold cannot grow to
+    ``quantity``.
+    """
+    state = _state()
+    key = str(product_id)
+    held = state.setdefault('held', {})
+    if state['owner'] is not None and quantity > held.get(key, 0):
+        if not reservations.set_hold(product_id, state['owner'], quantity):
+            db.session.rollback()
+            return False
+        db.session.commit()
+        held[key] = quantity
+    if quantity > 0:
+        state['items'][key] = quantity
+    else:
+        state['items'].pop(key, None)
+    if key not in state['dirty']:
+        state['dirty'].append(key)
+    _invalidate_summary(state)
+    state['token'] = uuid.uuid4().hex
+    session.modified = True
+    return True
+
+
+def available(product):
+    """Units of ``product`` this visitor can have in their cart."""
+    held = reservations.held(product.id, current_user.id) if current_user.is_authenticated else 0
+    return product.available_quantity + held
+
+
+def summary():
+    """Cart lines, unit count and subtotal from one query.
+
+    Only the product columns the cart pages show are selected, and line
+    totals and the subtotal are computed by the database.
+    """
+    cart = items()
+    if not cart:
+        return CartSummary([], 0, 0.0)
+    quantity = case(cart, value=Product.id)
+    position = case({pid: i for i, pid in enumerate(cart)}, value=Product.id)
+    line_total = Product.price * quantity
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.price, Product.quantity, Product.in_stock,
+               Product.img_url, Category.name.label('category'),
+               quantity.label('cart_quantity'), line_total.label('line_total'),
+               func.sum(line_total).over().label('subtotal'))
+        .outerjoin(Category, Category.id == Product.category_id)
+        .where(Product.id.in_(cart))
+        .order_by(position)
+    ).all()
+    lines = [CartLine(row.id, CartProduct(*row[:7]), row.cart_quantity, row.line_total) for row in rows]
+    return CartSummary(lines, sum(line.quantity for line in lines), rows[0].subtotal if rows else 0.0)
+
+
+def cached_summary():
+    """``{'lines', 'count', 'subtotal'}`` for the mini-cart, cached per session cart."""
+    state = _state()
+    key = f"cart-summary:{state['token']}"
+    cache = fragment_cache.store()
+    cached = cache.get(key, key)
+    if cached is not None:
+        return json.loads(cached)
+    current = summary()
+    data = {'lines': len(current.lines), 'count': current.count, 'subtotal': round(current.subtotal, 2)}
+    cache.set(key, json.dumps(data), current_app.config.get('CART_SUMMARY_TTL', 60), key)
+    return data
+
+
+def _invalidate_summary(state):
+    # frees this process's entry; other processes miss on the new token
+    key = f"cart-summary:{state['token']}"
+    fragment_cache.store().invalidate(key)
+
+
+def _persist(user_id, state, replace=False):
+    """Write the dirty lines and their holds, then commit.
+
+    With ``replace`` every saved line of the user is rewritten from the
+    session cart, not just the dirty ones.
+    """
+    dirty = sorted({int(pid) for pid in state['dirty']}
+                   | ({int(pid) for pid in state['items']} if replace else set()))
+    if replace:
+        db.session.execute(delete(Cart).where(Cart.user_id == user_id))
+    elif dirty:
+        db.session.execute(delete(Cart).where(Cart.user_id == user_id, Cart.product_id.in_(dirty)))
+    rows = [{'user_id': user_id, 'product_id': pid, 'quantity': state['items'][str(pid)]}
+            for pid in dirty if str(pid) in state['items']]
+    if rows:
+        db.session.execute(insert(Cart), rows)
+    held = state.setdefault('held', {})
+    for pid in dirty:
+        # releases what shrank, refreshes the rest and takes holds for lines
+        # merged in at login; one that can't grow is re-checked at checkout
+        quantity = state['items'].get(str(pid), 0)
+        if reservations.set_hold(pid, user_id, quantity):
+            held[str(pid)] = quantity
+    for pid in [pid for pid, quantity in held.items() if not quantity]:
+        del held[pid]
+    db.session.commit()
+    state['dirty'] = []
+    state['flushed'] = time.time()
+
+
+def flush(replace=False):
+    """Persist the current user's cart now (no-op for anonymous carts).
+
+    ``replace`` makes the saved cart exactly the session cart, dropping
+    lines another session saved; checkout uses it.
+    """
+    state = _state()
+    if state['owner'] is None:
+        return
+    _persist(state['owner'], state, replace)
+    session.modified = True
+
+
+def clear():
+    """Forget the cart after checkout has turned it into an order."""
+    _invalidate_summary(_state())
+    session[SESSION_KEY] = _new_state(current_user.id if current_user.is_authenticated else None)
+
+
+def _flush_if_due(response):
+    if request.blueprint != 'shop':
+        return response
+    state = session.get(SESSION_KEY)
+    if not state or state.get('owner') is None or not state.get('dirty'):
+        return response
+    if time.time() - state.get('flushed', 0) < current_app.config.get('CART_FLUSH_INTERVAL', 30):
+        return response
+    try:
+        _persist(state['owner'], state)
+        session.modified = True
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Could not save cart for user %s', state['owner'])
+    return response
+
+
+def _merge_on_login(sender, user, **extra):
+    session[SESSION_KEY] = _adopt(user.id, session.get(SESSION_KEY))
+
+
+def _flush_on_logout(sender, user, **extra):
+    state = session.pop(SESSION_KEY, None)
+    if not state or state.get('owner') != getattr(user, 'id', None) or not state.get('dirty'):
+        return
+    try:
+        _persist(user.id, state)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Could not save cart for user %s', user.id)
@@ -0,0 +1,155 @@
+"""Marketplace catalog queries.
+
+Filtering, sorting and pagination all happen in SQL so a marketplace hit only
+loads the products that end up on screen. Popularity and rating sorts read the
+counters maintained by ``utils.product_stats``. Pages are addressed with
+keyset cursors (``?after=``) rather than offsets, so page N costs the same as
+page 1.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from models.product_model import Product
+from utils import facets, search
+
+PER_PAGE = 24
+
+SORTS = ('relevance', 'date', 'price_asc', 'price_desc', 'popularity', 'rating')
+
+
+class CatalogPage:
+    """One screen of products plus the cursor for the next one."""
+
+    def __init__(self, items, next_cursor=None, sort=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.sort = sort
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _parse_price(value):
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def apply_filters(query, q=None, category=None, min_price=None, max_price=None):
+    """Apply the public marketplace filters to a Product query."""
+    query = query.filter(Product.is_active == True)
+    query = search.filter_query(query, q)
+    query = facets.filter_category(query, category)
+    min_price = _parse_price(min_price)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    max_price = _parse_price(max_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    return query
+
+
+def _sort_key(sort, matches=None):
+    """Return (column expression, descending, value type) for a sort name."""
+    if sort == 'relevance':
+        return matches.c.rank, False, float
+    if sort == 'price_asc':
+        return Product.price, False, float
+    if sort == 'price_desc':
+        return Product.price, True, float
+    if sort == 'popularity':
+        return Product.units_sold, True, int
+    if sort == 'rating':
+        return Product.avg_rating, True, float
+    return Product.created_at, True, datetime  # default: newest first
+
+
+def encode_cursor(sort, value, product_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, product_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort, value_type):
+    """Decode an ``after`` cursor; returns (value, id) or None if unusable."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, product_id = json.loads(raw)
+        if cursor_sort != sort:
+            return None
+        if value_type is datetime:
+            value = datetime.fromisoformat(value)
+        else:
+            value = value_type(value)
+        return value, int(product_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def browse(q=None, category=None, min_price=None, max_price=None, sort=None, after=None, per_page=PER_PAGE):
+    """Return a CatalogPage of active products for the given filters.
+
+    A text query is ranked by relevance (and given highlighted
+    ``search_snippet`` attributes) unless another sort is asked for.
+    """
+    matches = search.ranked_matches(q) if q else None
+    if sort not in SORTS:
+        sort = 'relevance' if matches is not None else 'date'
+    if sort == 'relevance' and matches is None:
+        sort = 'date'
+
+    if matches is not None:
+        query = Product.query.add_columns(matches.c.rank, matches.c.snippet)
+        query = query.join(matches, matches.c.product_id == Product.id)
+        query = apply_filters(query, None, category, min_price, max_price)
+    else:
+        query = apply_filters(Product.query, q, category, min_price, max_price)
+
+    key, descending, value_type = _sort_key(sort, matches)
+    position = decode_cursor(after, sort, value_type)
+    if position is not None:
+        value, last_id = position
+        if descending:
+            query = query.filter(or_(key < value, and_(key == value, Product.id < last_id)))
+        else:
+            query = query.filter(or_(key > value, and_(key == value, Product.id > last_id)))
+    if descending:
+        query = query.order_by(key.desc(), Product.id.desc())
+    else:
+        query = query.order_by(key.asc(), Product.id.asc())
+
+    rows = query.limit(per_page + 1).all()
+    items = []
+    for row in rows[:per_page]:
+        if matches is not None:
+            product, rank, snippet = row
+            product.search_rank = rank
+            product.search_snippet = search.highlight(snippet)
+        else:
+            product = row
+        items.append(product)
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        if sort == 'relevance':
+            last_value = last.search_rank
+        else:
+            last_value = {
+                'price_asc': last.price,
+                'price_desc': last.price,
+                'popularity': last.units_sold,
+                'rating': last.avg_rating,
+            }.get(sort, last.created_at)
+        next_cursor = encode_cursor(sort, last_value, last.id)
+    return CatalogPage(items, next_cursor, sort)
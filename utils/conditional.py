@@ -0,0 +1,108 @@
+"""Conditional GET for public pages.
+
+A view wrapped in ``@conditional(version)`` first calls ``version(**view_args)``,
+which returns a few cheap aggregates describing everything the page shows
+(typically ``table_version()`` / ``row_version()`` results). They are hashed,
+together with the viewer and a stamp of the templates, into a weak ETag and
+the newest timestamp among them becomes ``Last-Modified``. A matching
+``If-None-Match`` (or, without one, a fresh enough ``If-Modified-Since``) is
+answered with 304 before the view runs, so no template is rendered.
+
+Pages carry per-user navigation, so responses are ``private, no-cache``: the
+browser keeps its copy and revalidates on every visit.
+"""
+import hashlib
+import os
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, request, session
+from flask_login import current_user
+from sqlalchemy import func
+
+from models import db
+
+
+def init_app(app):
+    # Deploying new templates must change every ETag even if no data changed
+    newest = 0.0
+    for dirpath, _, filenames in os.walk(os.path.join(app.root_path, app.template_folder)):
+        for filename in filenames:
+            newest = max(newest, os.path.getmtime(os.path.join(dirpath, filename)))
+    app.extensions['conditional_get'] = f'{newest:.0f}'
+
+
+def table_version(column, *criteria):
+    """(row count, newest ``column``) for the rows matching ``criteria``."""
+    query = db.session.query(func.count(), func.max(column))
+    if criteria:
+        query = query.filter(*criteria)
+    return tuple(query.one())
+
+
+def row_version(columns, *criteria):
+    """Selected columns of the single row matching ``criteria``, or None."""
+    row = db.session.query(*columns).filter(*criteria).first()
+    return tuple(row) if row is not None else None
+
+
+def _flatten(parts):
+    for part in parts:
+        if isinstance(part, (tuple, list)):
+            yield from _flatten(part)
+        else:
+            yield part
+
+
+def _validators(parts):
+    if current_user.is_authenticated:
+        viewer = f'{current_user.get_id()}:{current_user.role}'
+    else:
+        viewer = 'anonymous'
+    values = list(_flatten(parts))
+    key = repr((request.endpoint, values, viewer, current_app.extensions.get('conditional_get'), datetime.utcnow().year))
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    stamps = [value for value in values if isinstance(value, datetime)]
+    return etag, (max(stamps).replace(microsecond=0) if stamps else None)
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return request.if_modified_since.replace(tzinfo=None) >= last_modified
+    return False
+
+
+def conditional(version):
+    """Answer conditional GETs for a view from ``version(**view_args)``.
+
+    ``version`` returns a tuple of aggregates, or None when the page does
+    not exist (the view then runs and produces its own 404).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Flashed messages are one-off content the stamp cannot see
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(*args, **kwargs)
+            parts = version(*args, **kwargs)
+            if parts is None:
+                return view(*args, **kwargs)
+            etag, last_modified = _validators(parts)
+
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
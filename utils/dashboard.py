@@ -0,0 +1,77 @@
+"""Admin dashboard snapshot.
+
+The dashboard's counts and recent activity are computed by ``compute`` in
+one pass (the counts in a single SELECT of scalar subqueries) and kept in
+the fragment cache store as JSON under ``SNAPSHOT_KEY``. A background job
+recomputes it every ``DASHBOARD_REFRESH_INTERVAL`` seconds, so page loads
+read the cached copy; ``DASHBOARD_SNAPSHOT_TTL`` bounds how stale it can
+get if the job is not running. ``refresh`` recomputes it on demand (the
+dashboard's refresh button).
+"""
+import json
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from models import db
+from models.consultant_model import Consultant
+from models.consultation_models import Consultation
+from models.order_model import Order
+from models.product_model import Product, Review
+from models.user_model import User
+from utils import fragment_cache, low_stock
+
+SNAPSHOT_KEY = 'admin-dashboard'
+RECENT = 5
+
+
+def init_app(app):
+    from utils import background
+    background.register(app, 'dashboard-refresh', app.config.get('DASHBOARD_REFRESH_INTERVAL', 60), refresh)
+
+
+def _count(*criteria, of):
+    return select(func.count(of)).where(*criteria).scalar_subquery()
+
+
+def compute():
+    """Counts and recent activity for the dashboard, as a JSON-ready dict."""
+    counts = db.session.execute(select(
+        _count(of=User.id).label('users'),
+        _count(of=Product.id).label('products'),
+        _count(of=Order.id).label('orders'),
+        _count(of=Consultant.id).label('consultants'),
+        _count(Consultation.status == 'pending', of=Consultation.id).label('pending_consultations'),
+        _count(Review.is_approved == False, of=Review.id).label('unapproved_reviews'),
+    )).one()
+    recent_users = db.session.execute(
+        select(User.id, User.name, User.email, User.role).order_by(User.created_at.desc()).limit(RECENT)
+    ).mappings().all()
+    recent_orders = db.session.execute(
+        select(Order.id, Order.total_amount, Order.status, Order.created_at)
+        .order_by(Order.created_at.desc(), Order.id.desc()).limit(RECENT)
+    ).mappings().all()
+    return {
+        'counts': dict(counts._mapping, low_stock=low_stock.count()),
+        'recent_users': [dict(row) for row in recent_users],
+        'recent_orders': [dict(row, created_at=row['created_at'].isoformat() if row['created_at'] else None)
+                          for row in recent_orders],
+        'refreshed_at': datetime.utcnow().isoformat(timespec='seconds'),
+    }
+
+
+def refresh():
+    """Recompute the snapshot and store it; returns it."""
+    data = compute()
+    fragment_cache.store().set(SNAPSHOT_KEY, json.dumps(data),
+                               current_app.config.get('DASHBOARD_SNAPSHOT_TTL', 300), SNAPSHOT_KEY)
+    return data
+
+
+def snapshot():
+    """The cached snapshot, computed now if there is none."""
+    cached = fragment_cache.store().get(SNAPSHOT_KEY, SNAPSHOT_KEY)
+    if cached is not None:
+        return json.loads(cached)
+    return refresh()
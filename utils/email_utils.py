@@ -0,0 +1,257 @@
+"""Outgoing email through a persistent outbox.
+
+Requests never talk to a mail server. ``queue_email`` adds an
+``email_outbox`` row to the current transaction (the caller commits), and
+``send_email_if_configured`` does the same and commits. A background job
+drains the outbox every ``MAIL_SEND_INTERVAL`` seconds in batches of
+``MAIL_BATCH_SIZE`` over one SMTP connection that is kept open between
+batches and reopened if the server drops it.
+
+Rows are claimed by setting ``status='sending'`` with ``next_attempt_at``
+as a lease, so several workers never send the same message and a crashed
+worker's batch is picked up again once the lease runs out. A failed send
+is retried with exponential backoff (``MAIL_RETRY_BACKOFF`` doubling up to
+``MAIL_RETRY_BACKOFF_MAX``); after ``MAIL_MAX_ATTEMPTS`` tries, or on a
+permanent 5xx rejection, the row is dead-lettered (``status='dead'``) and
+kept for inspection. ``manage.py requeue-email`` puts dead rows back.
+
+``MAIL_BACKEND`` picks the transport:
+
+* ``smtp``: ``MAIL_SERVER``, ``MAIL_PORT``, ``MAIL_USE_TLS``,
+  ``MAIL_USE_SSL``, ``MAIL_USERNAME``, ``MAIL_PASSWORD``. For local
+  testing point it at a stand-in such as
+  ``python -m aiosmtpd -n -l localhost:1025`` (``MAIL_PORT=1025``,
+  ``MAIL_USE_TLS=False``).
+* ``file``: each message is written as an ``.eml`` file under
+  ``MAIL_FILE_DIR``.
+
+With no backend nothing is queued and the send functions report False.
+"""
+import os
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from models import db
+from models.email_model import EmailOutbox
+
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+class SMTPBackend:
+    """One SMTP connection, opened on first use and reused afterwards."""
+
+    def __init__(self, host, port, use_tls=True, use_ssl=False, username=None, password=None, timeout=30):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        factory = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        conn = factory(self.host, self.port, timeout=self.timeout)
+        if self.use_tls and not self.use_ssl:
+            conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password)
+        return conn
+
+    def send(self, message):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.send_message(message)
+                    return
+                except smtplib.SMTPServerDisconnected:
+                    # idle connection timed out server-side; nothing was sent
+                    self._conn = None
+            self._conn = self._connect()
+            self._conn.send_message(message)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.quit()
+                except smtplib.SMTPException:
+                    pass
+                self._conn = None
+
+
+class FileBackend:
+    """Writes every message to ``directory`` as an .eml file."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def send(self, message):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{datetime.utcnow():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.eml"
+        with open(os.path.join(self.directory, name), 'wb') as f:
+            f.write(message.as_bytes())
+
+    def close(self):
+        pass
+
+
+def init_app(app):
+    from utils import background
+    backend = app.config.get('MAIL_BACKEND')
+    if backend == 'smtp' and app.config.get('MAIL_SERVER'):
+        app.extensions['email'] = SMTPBackend(
+            app.config['MAIL_SERVER'],
+            app.config.get('MAIL_PORT', 587),
+            use_tls=app.config.get('MAIL_USE_TLS', True),
+            use_ssl=app.config.get('MAIL_USE_SSL', False),
+            username=app.config.get('MAIL_USERNAME'),
+            password=app.config.get('MAIL_PASSWORD'),
+        )
+    elif backend == 'file':
+        app.extensions['email'] = FileBackend(app.config['MAIL_FILE_DIR'])
+    else:
+        app.extensions['email'] = None
+        return
+    background.register(app, 'email-sender', app.config.get('MAIL_SEND_INTERVAL', 10), send_pending)
+
+
+def is_configured():
+    return current_app.extensions.get('email') is not None
+
+
+def queue_email(to, subject, body):
+    """Add a message to the outbox in the current transaction.
+
+    Returns the outbox row, or None when no mail backend is configured.
+    """
+    if not is_configured() or not to:
+        return None
+    message = EmailOutbox(recipient=to, subject=subject, body=body)
+    db.session.add(message)
+    return message
+
+
+def send_email_if_configured(to, subject, body):
+    """Queue a message and commit; returns whether it was queued."""
+    if queue_email(to, subject, body) is None:
+        return False
+    db.session.commit()
+    return True
+
+
+def _build_message(row):
+    message = EmailMessage()
+    message['From'] = current_app.config.get('MAIL_DEFAULT_SENDER', 'no-reply@localhost')
+    message['To'] = row.recipient
+    message['Subject'] = row.subject
+    message['Date'] = formatdate(localtime=True)
+    message['Message-ID'] = make_msgid(idstring=f'outbox-{row.id}')
+    message.set_content(row.body)
+    return message
+
+
+def _claim(batch_size):
+    """Lease up to ``batch_size`` due messages to this worker."""
+    now = datetime.utcnow()
+    due = (EmailOutbox.status.in_(('pending', 'sending')), EmailOutbox.next_attempt_at <= now)
+    ids = select(EmailOutbox.id).where(*due).order_by(EmailOutbox.id).limit(batch_size)
+    rows = db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(ids), *due)
+        .values(status='sending', next_attempt_at=now + CLAIM_LEASE)
+        .returning(EmailOutbox.id, EmailOutbox.recipient, EmailOutbox.subject,
+                   EmailOutbox.body, EmailOutbox.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return sorted(rows, key=lambda row: row.id)
+
+
+def _is_permanent(exc):
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(exc, smtplib.SMTPResponseException) and 500 <= exc.smtp_code < 600
+
+
+def _is_connection_error(exc):
+    # SMTPException subclasses OSError; only socket-level failures count here
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def _retry_delay(attempts):
+    config = current_app.config
+    base = config.get('MAIL_RETRY_BACKOFF', 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), config.get('MAIL_RETRY_BACKOFF_MAX', 3600)))
+
+
+def send_pending(batch_size=None):
+    """Deliver due messages; returns (sent, retried, dead) counts."""
+    backend = current_app.extensions.get('email')
+    if backend is None:
+        return 0, 0, 0
+    batch_size = batch_size or current_app.config.get('MAIL_BATCH_SIZE', 50)
+    max_attempts = current_app.config.get('MAIL_MAX_ATTEMPTS', 6)
+    sent = retried = dead = 0
+    while True:
+        rows = _claim(batch_size)
+        if not rows:
+            break
+        changes = []
+        connection_lost = False
+        for row in rows:
+            if connection_lost:
+                # not attempted: hand it straight back
+                changes.append({'id': row.id, 'status': 'pending', 'next_attempt_at': datetime.utcnow()})
+                continue
+            now = datetime.utcnow()
+            try:
+                backend.send(_build_message(row))
+            except Exception as exc:
+                attempts = row.attempts + 1
+                error = f'{type(exc).__name__}: {exc}'[:1000]
+                if _is_permanent(exc) or attempts >= max_attempts:
+                    changes.append({'id': row.id, 'status': 'dead', 'attempts': attempts,
+                                    'last_error': error, 'next_attempt_at': now})
+                    dead += 1
+                    current_app.logger.error('Email %s dead-lettered: %s', row.id, error)
+                else:
+                    changes.append({'id': row.id, 'status': 'pending', 'attempts': attempts,
+                                    'last_error': error, 'next_attempt_at': now + _retry_delay(attempts)})
+                    retried += 1
+                    current_app.logger.warning('Email %s failed (attempt %d): %s', row.id, attempts, error)
+                # the server is unreachable: the rest of the batch would fail the same way
+                connection_lost = _is_connection_error(exc)
+            else:
+                changes.append({'id': row.id, 'status': 'sent', 'attempts': row.attempts + 1,
+                                'last_error': None, 'sent_at': now})
+                sent += 1
+        for keys in {tuple(sorted(change)) for change in changes}:
+            db.session.execute(update(EmailOutbox), [c for c in changes if tuple(sorted(c)) == keys])
+        db.session.commit()
+        if connection_lost or len(rows) < batch_size:
+            break
+    return sent, retried, dead
+
+
+def requeue_dead():
+    """Give dead-lettered messages a fresh set of attempts."""
+    count = db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.status == 'dead')
+        .values(status='pending', attempts=0, next_attempt_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return count
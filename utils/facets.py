@@ -0,0 +1,150 @@
+"""Category facets with cached active-product counts.
+
+Categories live in their own table and products point at them by id, so the
+filter sidebar and the admin pickers read one small cached list instead of
+running ``SELECT DISTINCT category`` over the products table, and a rename
+updates a single row.
+
+The list is kept per process and dropped after any commit that added,
+removed, re-categorized or (de)activated a product or touched a category.
+A short TTL covers writes made by other processes. A name missing from the
+list (say, a category another process just created) is looked up in the
+table, and the list is dropped so the next read picks it up.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import and_, event, false, func, inspect
+from sqlalchemy.orm import Session
+
+from models import db
+from models.product_model import Category, Product
+
+# Seconds before the cached counts are re-read even without local writes
+CACHE_TTL = 300
+
+# Product attributes that move a product between facets
+_FACET_ATTRS = ('category_id', 'category_ref', 'is_active')
+_STALE_KEY = 'facets_stale'
+
+Facet = namedtuple('Facet', 'id name count')
+
+_cache = {'facets': None, 'loaded_at': 0.0}
+_lock = threading.Lock()
+
+
+def invalidate():
+    with _lock:
+        _cache['facets'] = None
+
+
+def categories():
+    """All categories as (id, name, count) by name; count is active products."""
+    with _lock:
+        facets = _cache['facets']
+        if facets is not None and time.monotonic() - _cache['loaded_at'] < CACHE_TTL:
+            return facets
+    rows = (
+        db.session.query(Category.id, Category.name, func.count(Product.id))
+        .outerjoin(Product, and_(Product.category_id == Category.id, Product.is_active == True))
+        .group_by(Category.id, Category.name)
+        .order_by(Category.name)
+    )
+    facets = [Facet(*row) for row in rows]
+    with _lock:
+        _cache['facets'] = facets
+        _cache['loaded_at'] = time.monotonic()
+    return facets
+
+
+def category_names():
+    return [facet.name for facet in categories()]
+
+
+def category_id(name):
+    cid = next((facet.id for facet in categories() if facet.name == name), None)
+    if cid is None:
+        cid = db.session.query(Category.id).filter(Category.name == name).scalar()
+        if cid is not None:
+            invalidate()
+    return cid
+
+
+def filter_category(query, name):
+    """Restrict a Product query to one category, matched by its id."""
+    if not name:
+        return query
+    cid = category_id(name)
+    return query.filter(Product.category_id == cid if cid is not None else false())
+
+
+def _product_ids(category):
+    return [pid for (pid,) in db.session.query(Product.id).filter(Product.category_id == category.id)]
+
+
+def rename_category(category, new_name):
+    """Rename a category; merges into ``new_name`` if that already exists.
+
+    Only the merge case touches products (those in ``category``). The
+    caller commits.
+    """
+    from utils import search
+
+    affected = _product_ids(category)
+    existing = Category.query.filter(Category.name == new_name, Category.id != category.id).first()
+    if existing:
+        Product.query.filter(Product.category_id == category.id).update(
+            {Product.category_id: existing.id}, synchronize_session=False)
+        db.session.delete(category)
+    else:
+        category.name = new_name
+    # The search index stores the category name next to each product
+    search.reindex(affected)
+
+
+def delete_category(category):
+    """Delete a category and leave its products uncategorized. The caller commits."""
+    from utils import search
+
+    affected = _product_ids(category)
+    Product.query.filter(Product.category_id == category.id).update(
+        {Product.category_id: None}, synchronize_session=False)
+    db.session.delete(category)
+    search.reindex(affected)
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_stale(session, flush_context):
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (Product, Category)):
+            session.info[_STALE_KEY] = True
+            return
+    for obj in session.dirty:
+        if isinstance(obj, Category):
+            session.info[_STALE_KEY] = True
+            return
+        if isinstance(obj, Product):
+            state = inspect(obj)
+            if any(state.attrs[attr].history.has_changes() for attr in _FACET_ATTRS):
+                session.info[_STALE_KEY] = True
+                return
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_stale_bulk(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in (Product, Category):
+            orm_execute_state.session.info[_STALE_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _drop_on_commit(session):
+    if session.info.pop(_STALE_KEY, False):
+        invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop(_STALE_KEY, None)
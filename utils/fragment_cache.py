@@ -0,0 +1,238 @@
+"""``{% cache %}`` fragment caching for Jinja templates.
+
+Listing pages can't be cached whole (the navbar is per user), but the
+markup for each item is the same for everyone. Wrap it in::
+
+    {% cache fragment_key(product, 'card'), 3600 %}
+        ...
+    {% endcache %}
+
+``fragment_key(obj, *extra)`` is ``(table, id, updated_at, *extra)``, so an
+edited row renders under a new key. The first two parts also act as a tag:
+after a commit that changes or deletes a Product, ForumTopic or Post (or
+adds a message to a topic), every fragment tagged with that row is dropped.
+Bulk admin UPDATEs bypass the ORM, so ``utils.bulk_actions.rows_updated``
+is handled the same way.
+Keys also include the template name, line and modification time, so edited
+templates never serve old markup.
+
+Stores implement ``get(key, tag)``, ``set(key, value, ttl, tag)``,
+``invalidate(tag)`` and ``clear()``; the one used is chosen with ``FRAGMENT_CACHE_TYPE``: ``lru`` (per process,
+``FRAGMENT_CACHE_SIZE`` entries), ``disk`` (shared by all processes under
+``FRAGMENT_CACHE_DIR``) or ``null``.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models.forum_model import ForumMessage, ForumTopic
+from models.post_model import Post
+from models.product_model import Product
+
+_TAGS_KEY = 'fragment_cache_tags'
+
+
+class NullStore:
+    def get(self, key, tag=None):
+        return None
+
+    def set(self, key, value, ttl=None, tag=None):
+        pass
+
+    def invalidate(self, tag):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUStore:
+    """In-process store; least recently used entries go first."""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, tag, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, tag=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, ttl=None, tag=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, tag, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tag):
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry[1] == tag]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskStore:
+    """Files under ``root/<tag>/<key hash>``, shared between processes.
+
+    Each file holds the expiry time (0 for none) on its first line and the
+    markup after it. Invalidating a tag removes its directory.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _tag_dir(self, tag):
+        return os.path.join(self.root, hashlib.sha1(tag.encode('utf-8')).hexdigest() if tag else '_')
+
+    def _path(self, key, tag):
+        return os.path.join(self._tag_dir(tag), hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key, tag=None):
+        path = self._path(key, tag)
+        try:
+            with open(path, encoding='utf-8') as f:
+                expires_at = float(f.readline())
+                if expires_at and expires_at < time.time():
+                    raise FileNotFoundError
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, value, ttl=None, tag=None):
+        path = self._path(key, tag)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+            tmp.write(f'{time.time() + ttl if ttl else 0}\n')
+            tmp.write(value)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, tag):
+        shutil.rmtree(self._tag_dir(tag), ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def init_app(app):
+    kind = app.config.get('FRAGMENT_CACHE_TYPE', 'lru')
+    if kind == 'disk':
+        store = DiskStore(app.config['FRAGMENT_CACHE_DIR'])
+    elif kind == 'lru':
+        store = LRUStore(app.config.get('FRAGMENT_CACHE_SIZE', 2048))
+    else:
+        store = NullStore()
+    app.extensions['fragment_cache'] = store
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.globals['fragment_key'] = fragment_key
+    from utils.bulk_actions import rows_updated
+    rows_updated.connect(_invalidate_rows)
+
+
+def store():
+    return current_app.extensions.get('fragment_cache') or NullStore()
+
+
+def fragment_key(obj, *extra):
+    updated_at = getattr(obj, 'updated_at', None)
+    return (obj.__tablename__, obj.id, updated_at.isoformat() if updated_at else None) + extra
+
+
+def _tag(table, row_id):
+    return f'{table}:{row_id}'
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        # Template identity: a changed template never reuses old fragments
+        try:
+            mtime = int(os.path.getmtime(parser.filename)) if parser.filename else 0
+        except OSError:
+            mtime = 0
+        args.append(nodes.Const(f'{parser.name}:{lineno}:{mtime}'))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache_support', args), [], [], body).set_lineno(lineno)
+
+    def _cache_support(self, key, ttl, origin, caller):
+        parts = key if isinstance(key, (tuple, list)) else (key,)
+        tag = _tag(parts[0], parts[1]) if len(parts) >= 2 else None
+        full_key = '|'.join([origin] + [str(part) for part in parts])
+        cache = store()
+        if ttl is None:
+            ttl = current_app.config.get('FRAGMENT_CACHE_TTL')
+        value = cache.get(full_key, tag)
+        if value is None:
+            value = str(caller())
+            cache.set(full_key, value, ttl, tag)
+        return Markup(value)
+
+
+def _tags_for(obj):
+    if isinstance(obj, (Product, ForumTopic, Post)):
+        return [_tag(obj.__tablename__, obj.id)]
+    if isinstance(obj, ForumMessage):
+        # Topic rows show message counts
+        return [_tag(ForumTopic.__tablename__, obj.topic_id)]
+    return []
+
+
+def _invalidate_rows(table, ids=()):
+    cache = store()
+    for row_id in ids:
+        cache.invalidate(_tag(table, row_id))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_tags(session, flush_context):
+    tags = session.info.setdefault(_TAGS_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tags.update(_tags_for(obj))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    tags = session.info.pop(_TAGS_KEY, None)
+    if not tags:
+        return
+    try:
+        cache = store()
+    except RuntimeError:  # committed outside an app context
+        return
+    for tag in tags:
+        cache.invalidate(tag)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop(_TAGS_KEY, None)
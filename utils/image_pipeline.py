@@ -0,0 +1,175 @@
+"""Resized WebP/JPEG derivatives of product images.
+
+After an upload commits, the original blob's key is handed to a small
+thread pool that writes a card, detail and zoom rendition in WebP plus a
+JPEG fallback. Derivatives live next to the blob store at a path derived
+from (key, variant, format), so nothing about them is kept in the
+database: ``media.derivative`` serves the file if it exists and otherwise
+redirects to the original (and queues the missing work).
+
+Templates call ``picture(url, variant, alt=...)`` to get a ``<picture>``
+element with ``srcset``/``sizes`` for a /media/ URL.
+"""
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, url_for
+from markupsafe import Markup, escape
+
+# Bump when the ladder or encoder settings change. It is part of every
+# derivative URL (/media/<key>/<version>/<variant>.<ext>), so immutable
+# copies of the old renditions in browsers and CDNs are never reused
+PIPELINE_VERSION = 'v1'
+
+# variant name -> target width in pixels (never upscaled)
+VARIANTS = {
+    'card': 320,
+    'detail': 800,
+    'zoom': 1600,
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Default ``sizes`` hints per variant used by picture()
+SIZES = {
+    'card': '(max-width: 576px) 50vw, 280px',
+    'detail': '(max-width: 768px) 100vw, 50vw',
+    'zoom': '100vw',
+}
+
+_MEDIA_URL_RE = re.compile(r'/media/([0-9a-f]{64})\.\w+$')
+
+_pending = set()
+_failed = set()  # blobs Pillow cannot decode; not retried in this process
+_pending_lock = threading.Lock()
+
+
+def init_app(app):
+    workers = app.config.get('IMAGE_WORKERS', 2)
+    app.extensions['image_pipeline'] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='img') if workers else None
+    app.jinja_env.globals['picture'] = picture
+
+
+def derived_path(media_root, key, variant, fmt):
+    return os.path.join(media_root, 'derived', PIPELINE_VERSION, key[:2], key, f'{variant}.{fmt}')
+
+
+def key_from_url(url):
+    match = _MEDIA_URL_RE.search(url or '')
+    return match.group(1) if match else None
+
+
+def generate(media_root, key):
+    """Write every missing derivative of one blob. Safe to call repeatedly."""
+    from PIL import Image, ImageOps
+    from utils import blob_store
+
+    source = os.path.join(media_root, key[:2], key[2:4], key)
+    wanted = [(v, f) for v in VARIANTS for f in FORMATS if not os.path.exists(derived_path(media_root, key, v, f))]
+    if not wanted or not blob_store.KEY_RE.match(key) or not os.path.exists(source):
+        return 0
+
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+        written = 0
+        for variant, fmt in wanted:
+            width = VARIANTS[variant]
+            out = img
+            if img.width > width:
+                out = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+            if fmt == 'jpg' and out.mode == 'RGBA':
+                flat = Image.new('RGB', out.size, (255, 255, 255))
+                flat.paste(out, mask=out.getchannel('A'))
+                out = flat
+            path = derived_path(media_root, key, variant, fmt)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pil_format, options = FORMATS[fmt]
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as tmp:
+                    out.save(tmp, pil_format, **options)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            written += 1
+    return written
+
+
+def _run(media_root, key, logger):
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        generate(media_root, key)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning('Blob %s is not an image Pillow can decode; no derivatives', key)
+        with _pending_lock:
+            _failed.add(key)
+    except Exception:
+        # disk full, I/O errors and the like: the next request for a missing
+        # derivative queues the blob again
+        logger.exception('Could not build derivatives for blob %s', key)
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+
+
+def schedule(keys):
+    """Queue derivative generation for blob keys; runs inline with no pool."""
+    app = current_app._get_current_object()
+    media_root = app.config['MEDIA_ROOT']
+    executor = app.extensions.get('image_pipeline')
+    for key in keys:
+        if not key:
+            continue
+        with _pending_lock:
+            if key in _pending or key in _failed:
+                continue
+            _pending.add(key)
+        if executor is None:
+            _run(media_root, key, app.logger)
+        else:
+            executor.submit(_run, media_root, key, app.logger)
+
+
+def derivative_url(key, variant, fmt):
+    return url_for('media.derivative', key=key, version=PIPELINE_VERSION, variant=variant, ext=fmt)
+
+
+def srcset(key, fmt):
+    return ', '.join(
+        f"{derivative_url(key, variant, fmt)} {width}w"
+        for variant, width in VARIANTS.items()
+    )
+
+
+def picture(url, variant='card', alt='', sizes=None, **attrs):
+    """Render a responsive <picture> for a /media/ image URL.
+
+    Anything that is not a blob-store URL (legacy data: URIs, external
+    links) renders as a plain <img>. Extra keyword arguments become
+    attributes on the <img>, e.g. ``class='card-img-top'`` or
+    ``loading='lazy'``.
+    """
+    extra = ''.join(
+        f' {escape(name.rstrip("_").replace("_", "-"))}="{escape(value)}"'
+        for name, value in attrs.items() if value is not None
+    )
+    key = key_from_url(url)
+    if key is None:
+        return Markup(f'<img src="{escape(url or "")}" alt="{escape(alt)}"{extra}>')
+    sizes = sizes or SIZES.get(variant, '100vw')
+    fallback = derivative_url(key, variant, 'jpg')
+    return Markup(
+        '<picture>'
+        f'<source type="image/webp" srcset="{escape(srcset(key, "webp"))}" sizes="{escape(sizes)}">'
+        f'<img src="{escape(fallback)}" srcset="{escape(srcset(key, "jpg"))}" sizes="{escape(sizes)}"'
+        f' alt="{escape(alt)}"{extra}>'
+        '</picture>'
+    )
@@ -0,0 +1,173 @@
+"""Find queries that walk whole tables, using SQLite's EXPLAIN QUERY PLAN.
+
+``run()`` requests every GET page through the test client, logged in as an
+admin so the admin views are covered too, and records each SQL statement
+(with its parameters) and the endpoints that issued it. Each distinct
+statement is then explained. A plan step that reads a table without an
+index (``SCAN products`` rather than ``SEARCH products USING INDEX ...``)
+or sorts through a temporary b-tree is reported as a finding.
+
+URL arguments are filled with an existing row's id or slug, so run it
+against a database with some data in it. Pages that change state on GET
+(logout, the admin toggles) and file-serving routes are skipped.
+"""
+import re
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import event, func, inspect
+
+from models import db
+from models.consultant_model import Consultant
+from models.consultation_models import Consultation
+from models.forum_model import ForumTopic
+from models.order_model import Order
+from models.post_model import Post
+from models.product_model import Product
+from models.user_model import User
+
+# GET endpoints that are not pages or that write
+SKIP_ENDPOINTS = {
+    'static',
+    'auth.logout',
+    'auth.reset_password',
+    'admin.export',
+    'admin.verify_user',
+    'admin.toggle_consultant_verify',
+    'admin.toggle_consultant_active',
+}
+SKIP_PREFIXES = ('media.', 'assets.')
+
+# URL argument name -> column holding a usable value
+SAMPLE_COLUMNS = {
+    'slug': ForumTopic.slug,
+    'post_id': Post.id,
+    'product_id': Product.id,
+    'order_id': Order.id,
+    'user_id': User.id,
+    'consultant_id': Consultant.id,
+    'consultation_id': Consultation.id,
+}
+
+Finding = namedtuple('Finding', 'table detail statement endpoints rows')
+Report = namedtuple('Report', 'findings statements visited skipped failed')
+
+_SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+def _samples():
+    values = {}
+    for name, col in SAMPLE_COLUMNS.items():
+        value = db.session.query(col).order_by(col).limit(1).scalar()
+        if value is not None:
+            values[name] = value
+    return values
+
+
+def _urls(samples):
+    """Yield (endpoint, path) for each GET page, or (endpoint, None) if it can't be filled."""
+    for rule in sorted(current_app.url_map.iter_rules(), key=lambda r: r.rule):
+        if 'GET' not in rule.methods:
+            continue
+        if rule.endpoint in SKIP_ENDPOINTS or rule.endpoint.startswith(SKIP_PREFIXES):
+            continue
+        if not rule.arguments <= samples.keys():
+            yield rule.endpoint, None
+            continue
+        _, path = rule.build({arg: samples[arg] for arg in rule.arguments})
+        yield rule.endpoint, path
+
+
+def _admin_id():
+    return db.session.query(User.id).filter(User.role == 'admin').order_by(User.id).limit(1).scalar()
+
+
+def _capture(samples, user_id):
+    """Request every page and return ({statement: (params, endpoints)}, visited, skipped, failed)."""
+    app = current_app._get_current_object()
+    statements = {}
+    current = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not current:
+            return
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if verb not in ('SELECT', 'UPDATE', 'DELETE', 'WITH'):
+            return
+        entry = statements.setdefault(statement, (parameters, set()))
+        entry[1].add(current['endpoint'])
+
+    # background jobs start on the first request; this is not a server
+    app.extensions['background']['started'] = True
+    propagate = app.config.get('PROPAGATE_EXCEPTIONS')
+    app.config['PROPAGATE_EXCEPTIONS'] = True
+    visited, skipped, failed = [], [], []
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        with app.test_client() as client:
+            if user_id is not None:
+                with client.session_transaction() as session:
+                    session['_user_id'] = str(user_id)
+                    session['_fresh'] = True
+            for endpoint, path in _urls(samples):
+                if path is None:
+                    skipped.append(endpoint)
+                    continue
+                current['endpoint'] = endpoint
+                try:
+                    client.get(path)
+                    visited.append(endpoint)
+                except Exception as e:
+                    failed.append((endpoint, f'{type(e).__name__}: {e}'))
+                finally:
+                    current.clear()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+        app.config['PROPAGATE_EXCEPTIONS'] = propagate
+    return statements, visited, skipped, failed
+
+
+def explain(statement, parameters=()):
+    """Return the ``detail`` column of EXPLAIN QUERY PLAN for a statement."""
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+    return [row[-1] for row in rows]
+
+
+def problems(plan, tables):
+    """Yield (table, detail) for each plan step that scans a table or sorts in a temp b-tree."""
+    for detail in plan:
+        match = _SCAN_RE.match(detail)
+        if match and match.group(1) in tables:
+            yield match.group(1), detail
+        elif detail.startswith('USE TEMP B-TREE'):
+            yield None, detail
+
+
+def run(user_id=None):
+    """Visit every page and return a Report of the statements that scan tables.
+
+    Requests are made as ``user_id`` (default: the first admin).
+    """
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError('The index advisor reads SQLite query plans only.')
+    if user_id is None:
+        user_id = _admin_id()
+    statements, visited, skipped, failed = _capture(_samples(), user_id)
+    db.session.remove()
+
+    tables = set(inspect(db.engine).get_table_names())
+    row_counts = {}
+    findings = []
+    for statement, (parameters, endpoints) in statements.items():
+        try:
+            plan = explain(statement, parameters)
+        except Exception:
+            db.session.rollback()
+            continue
+        for table, detail in problems(plan, tables):
+            if table is not None and table not in row_counts:
+                row_counts[table] = db.session.query(func.count()).select_from(db.table(table)).scalar()
+            findings.append(Finding(table, detail, statement, sorted(endpoints), row_counts.get(table)))
+    # the biggest tables first; temp b-tree sorts after the scans
+    findings.sort(key=lambda f: (f.rows is None, -(f.rows or 0), f.table or '', f.detail))
+    return Report(findings, len(statements), visited, skipped, failed)
@@ -0,0 +1,238 @@
+"""Stock ledger on ``InventoryLog`` with daily snapshots.
+
+Every change to ``Product.quantity`` goes through this module and appends
+ledger rows (sale, restock, adjustment, return) in the caller's
+transaction; nothing else writes the column. Rows are only ever added:
+corrections are new ``adjustment`` rows.
+
+``take_snapshots`` (``manage.py inventory-snapshot``, run daily) stores per
+product the on-hand quantity, the units in and out since the previous
+snapshot and the id of the last ledger row it covers. Stock at a point in
+time, weekly movement and reconciliation then read one snapshot plus the
+few ledger rows after it instead of the whole history.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, func, insert, update
+
+from models import db
+from models.order_model import InventoryLog, InventorySnapshot, OrderItem
+from models.product_model import Product
+from utils import low_stock, product_stats
+
+CHANGE_TYPES = ('restock', 'sale', 'adjustment', 'return')
+
+
+def entry(product_id, change_type, quantity_change, new_quantity, user_id, notes=None):
+    """One ledger row as a dict, ready for ``append``."""
+    if change_type not in CHANGE_TYPES:
+        raise ValueError(f'unknown change type: {change_type!r}')
+    return {
+        'product_id': product_id,
+        'change_type': change_type,
+        'quantity_change': quantity_change,
+        'previous_quantity': new_quantity - quantity_change,
+        'new_quantity': new_quantity,
+        'notes': notes,
+        'created_at': datetime.utcnow(),
+        'created_by': user_id,
+    }
+
+
+def append(entries):
+    """Bulk-insert ledger rows. The caller commits."""
+    entries = list(entries)
+    if entries:
+        db.session.execute(insert(InventoryLog), entries)
+        low_stock.touch(e['product_id'] for e in entries)
+
+
+def record_initial(product, user_id):
+    """Opening ledger row for a newly added (flushed) product."""
+    if product.quantity:
+        append([entry(product.id, 'restock', product.quantity, product.quantity, user_id, 'Initial stock')])
+
+
+def adjust(product_id, change, change_type, user_id, notes=None, values=None):
+    """Move stock by ``change`` units relative to the stored value.
+
+    Relative, so it stays exact when a checkout runs at the same time.
+    ``values`` are extra SET values for the same UPDATE of the product row
+    (e.g. ``product_stats.sale_values``). Returns the new quantity, or None
+    if the product does not exist. The caller commits.
+    """
+    if not change:
+        return None
+    new_quantity = db.session.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values({Product.quantity: func.coalesce(Product.quantity, 0) + change, **(values or {})})
+        .returning(Product.quantity)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if new_quantity is None:
+        return None
+    append([entry(product_id, change_type, change, new_quantity, user_id, notes)])
+    return new_quantity
+
+
+def set_quantity(product, quantity, user_id, notes=None):
+    """Set a product's stock from a form: restock if it went up, else adjustment."""
+    change = quantity - (product.quantity or 0)
+    if not change:
+        return product.quantity
+    new_quantity = adjust(product.id, change, 'restock' if change > 0 else 'adjustment', user_id, notes)
+    db.session.expire(product, ['quantity'])
+    return new_quantity
+
+
+def return_order(order, user_id):
+    """Put a cancelled order's items back in stock (and on sale again) and
+    take them off the products' units sold. The caller commits (with the
+    status change)."""
+    items = db.session.query(OrderItem.product_id, func.sum(OrderItem.quantity)).filter(
+        OrderItem.order_id == order.id).group_by(OrderItem.product_id).order_by(OrderItem.product_id)
+    for product_id, quantity in items.all():
+        adjust(product_id, quantity, 'return', user_id, f'Order #{order.id} cancelled',
+               values={Product.in_stock: func.coalesce(Product.quantity, 0) + quantity > 0,
+                       **product_stats.sale_values(-quantity)})
+
+
+def _latest_snapshots(before=None):
+    """Subquery of each product's newest snapshot (optionally taken before a time)."""
+    newest = db.session.query(func.max(InventorySnapshot.id).label('id')).group_by(InventorySnapshot.product_id)
+    if before is not None:
+        newest = newest.filter(InventorySnapshot.created_at <= before)
+    return db.session.query(InventorySnapshot).filter(InventorySnapshot.id.in_(newest.subquery().select())).subquery()
+
+
+def ledger_quantities():
+    """{product_id: on-hand quantity according to the ledger}."""
+    snap = _latest_snapshots()
+    deltas = dict(
+        db.session.query(InventoryLog.product_id, func.sum(InventoryLog.quantity_change))
+        .outerjoin(snap, snap.c.product_id == InventoryLog.product_id)
+        .filter(InventoryLog.id > func.coalesce(snap.c.last_log_id, 0))
+        .group_by(InventoryLog.product_id)
+    )
+    quantities = {pid: qty for pid, qty in db.session.query(snap.c.product_id, snap.c.quantity)}
+    for product_id, delta in deltas.items():
+        quantities[product_id] = quantities.get(product_id, 0) + int(delta)
+    return quantities
+
+
+def take_snapshots(day=None):
+    """Write one snapshot row per product for ``day`` (default today).
+
+    Re-running for the same day replaces that day's rows. Returns the
+    number of rows written. Commits.
+    """
+    day = day or date.today()
+    InventorySnapshot.query.filter(InventorySnapshot.snapshot_date == day).delete(synchronize_session=False)
+    watermark = db.session.query(func.max(InventoryLog.id)).scalar() or 0
+
+    snap = _latest_snapshots()
+    previous = {row.product_id: row for row in db.session.query(snap)}
+    moved = (
+        db.session.query(
+            InventoryLog.product_id,
+            func.sum(InventoryLog.quantity_change),
+            func.sum(case((InventoryLog.quantity_change > 0, InventoryLog.quantity_change), else_=0)),
+            func.sum(case((InventoryLog.quantity_change < 0, -InventoryLog.quantity_change), else_=0)),
+        )
+        .outerjoin(snap, snap.c.product_id == InventoryLog.product_id)
+        .filter(InventoryLog.id > func.coalesce(snap.c.last_log_id, 0), InventoryLog.id <= watermark)
+        .group_by(InventoryLog.product_id)
+    )
+    movement = {pid: (int(delta), int(units_in), int(units_out)) for pid, delta, units_in, units_out in moved}
+
+    now = datetime.utcnow()
+    rows = []
+    for (product_id,) in db.session.query(Product.id).order_by(Product.id):
+        prev = previous.get(product_id)
+        delta, units_in, units_out = movement.get(product_id, (0, 0, 0))
+        rows.append({
+            'product_id': product_id,
+            'snapshot_date': day,
+            'quantity': (prev.quantity if prev else 0) + delta,
+            'units_in': units_in,
+            'units_out': units_out,
+            'last_log_id': watermark,
+            'created_at': now,
+        })
+    if rows:
+        db.session.execute(insert(InventorySnapshot), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def stock_at(product_id, when):
+    """On-hand quantity of a product at ``when`` (UTC)."""
+    snapshot = (
+        InventorySnapshot.query
+        .filter(InventorySnapshot.product_id == product_id, InventorySnapshot.created_at <= when)
+        .order_by(InventorySnapshot.id.desc())
+        .first()
+    )
+    delta = db.session.query(func.coalesce(func.sum(InventoryLog.quantity_change), 0)).filter(
+        InventoryLog.product_id == product_id,
+        InventoryLog.id > (snapshot.last_log_id if snapshot else 0),
+        InventoryLog.created_at <= when,
+    ).scalar()
+    return (snapshot.quantity if snapshot else 0) + int(delta)
+
+
+def weekly_movement(product_id, weeks=8):
+    """[(week start, units in, units out)] for the last ``weeks`` ISO weeks, oldest first."""
+    today = date.today()
+    start = today - timedelta(days=today.weekday() + 7 * (weeks - 1))
+    buckets = {start + timedelta(weeks=i): [0, 0] for i in range(weeks)}
+
+    def add(day, units_in, units_out):
+        week = day - timedelta(days=day.weekday())
+        if week in buckets:
+            buckets[week][0] += units_in
+            buckets[week][1] += units_out
+
+    # Snapshots carry the movement since the one before them; only the
+    # ledger rows after the newest snapshot still need reading
+    snapshots = InventorySnapshot.query.filter(
+        InventorySnapshot.product_id == product_id,
+        InventorySnapshot.snapshot_date >= start,
+    ).order_by(InventorySnapshot.id).all()
+    for snapshot in snapshots:
+        add(snapshot.snapshot_date, snapshot.units_in, snapshot.units_out)
+    newest = (
+        InventorySnapshot.query.filter(InventorySnapshot.product_id == product_id)
+        .order_by(InventorySnapshot.id.desc()).first()
+    )
+    recent = InventoryLog.query.filter(
+        InventoryLog.product_id == product_id,
+        InventoryLog.id > (newest.last_log_id if newest else 0),
+    )
+    for row in recent:
+        add(row.created_at.date(), max(row.quantity_change, 0), max(-row.quantity_change, 0))
+    return [(week, units_in, units_out) for week, (units_in, units_out) in sorted(buckets.items())]
+
+
+def reconcile(fix=False):
+    """Compare ``Product.quantity`` with the ledger.
+
+    Returns ``(product_id, ledger_quantity, stored_quantity)`` for every
+    product that disagrees. With ``fix`` an ``adjustment`` row brings the
+    ledger in line with the stored quantity (the ledger is never edited)
+    and the session is committed.
+    """
+    ledger = ledger_quantities()
+    drift = []
+    for product_id, stored, vendor_id in db.session.query(Product.id, Product.quantity, Product.vendor_id).order_by(Product.id):
+        expected = ledger.get(product_id, 0)
+        if expected != (stored or 0):
+            drift.append((product_id, expected, stored or 0, vendor_id))
+    if fix and drift:
+        append([
+            entry(product_id, 'adjustment', stored - expected, stored, vendor_id, 'Reconciliation')
+            for product_id, expected, stored, vendor_id in drift
+        ])
+        db.session.commit()
+    return [row[:3] for row in drift]
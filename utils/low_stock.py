@@ -0,0 +1,184 @@
+"""Low-stock detection from ``Product.min_quantity``.
+
+A product is low on stock while it is active and ``quantity <=
+min_quantity``, and ``low_stock_since`` is set exactly while it is. Alert
+lists and the count filter on that flag alone: the partial indexes
+``ix_products_low_stock`` (``low_stock_since, id``) and
+``ix_products_vendor_low_stock`` hold only flagged rows, and a range on
+their leading column is picked over the ``is_active`` indexes even before
+ANALYZE, so neither scans the catalog.
+
+Nothing is re-checked on a timer. Code that moves stock outside the ORM
+(``utils.inventory.append`` for every ledger write, bulk admin updates)
+calls ``touch(product_ids)``, and ORM changes to quantity, threshold or
+``is_active`` are picked up from flushes. Just before the session commits,
+only the touched products are re-evaluated: ``low_stock_since`` is set when
+one falls to its threshold and cleared when it recovers, and the cached
+count is dropped after the commit if anything changed.
+
+``manage.py low-stock-digest`` (run daily) queues one mail per vendor with
+their low products, and one with the full list for the admins, through the
+email outbox.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, event, func, inspect, update
+from sqlalchemy.orm import Session, joinedload
+
+from models import db
+from models.product_model import Product
+from models.user_model import User
+from utils import email_utils, fragment_cache
+
+COUNT_KEY = 'low-stock-count'
+TRACKED_ATTRS = ('quantity', 'min_quantity', 'is_active')
+_TOUCHED_KEY = 'low_stock_touched'
+_CHANGED_KEY = 'low_stock_changed'
+
+
+def is_low():
+    """Criteria for a product being low on stock (what sets the flag)."""
+    return and_(Product.quantity <= Product.min_quantity, Product.is_active == True)
+
+
+def flagged():
+    """Criteria for flagged products, written to match the partial indexes."""
+    return Product.low_stock_since.isnot(None)
+
+
+def touch(product_ids, session=None):
+    """Re-evaluate these products when the current transaction commits."""
+    session = session or db.session()
+    session.info.setdefault(_TOUCHED_KEY, set()).update(product_ids)
+
+
+def evaluate(product_ids, session=None):
+    """Update ``low_stock_since`` for the given products.
+
+    Returns (ids that became low, ids that recovered). The caller commits.
+    """
+    session = session or db.session()
+    ids = list(product_ids)
+    if not ids:
+        return [], []
+    rows = session.query(Product.id, Product.low_stock_since.isnot(None), is_low()).filter(Product.id.in_(ids))
+    became_low, recovered = [], []
+    for product_id, flagged, low in rows:
+        if low and not flagged:
+            became_low.append(product_id)
+        elif flagged and not low:
+            recovered.append(product_id)
+    # updated_at is kept as is: the flag is not a change to the product page
+    if became_low:
+        session.execute(update(Product).where(Product.id.in_(became_low))
+                        .values({Product.low_stock_since: datetime.utcnow(), Product.updated_at: Product.updated_at})
+                        .execution_options(synchronize_session=False))
+    if recovered:
+        session.execute(update(Product).where(Product.id.in_(recovered))
+                        .values({Product.low_stock_since: None, Product.updated_at: Product.updated_at})
+                        .execution_options(synchronize_session=False))
+    return became_low, recovered
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_touched(session, flush_context):
+    touched = [obj.id for obj in session.new if isinstance(obj, Product)]
+    for obj in session.dirty:
+        if isinstance(obj, Product):
+            state = inspect(obj)
+            if any(state.attrs[attr].history.has_changes() for attr in TRACKED_ATTRS):
+                touched.append(obj.id)
+    if touched:
+        touch(touched, session)
+
+
+@event.listens_for(Session, 'before_commit')
+def _evaluate_touched(session):
+    session.flush()  # collect changes still pending in the identity map
+    touched = session.info.pop(_TOUCHED_KEY, None)
+    if not touched:
+        return
+    became_low, recovered = evaluate(touched, session)
+    if became_low or recovered:
+        session.info[_CHANGED_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_count(session):
+    if not session.info.pop(_CHANGED_KEY, False):
+        return
+    try:
+        fragment_cache.store().invalidate(COUNT_KEY)
+    except RuntimeError:  # committed outside an app context
+        pass
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop(_TOUCHED_KEY, None)
+    session.info.pop(_CHANGED_KEY, None)
+
+
+def count():
+    """Number of low-stock products, cached until a product crosses its threshold."""
+    cache = fragment_cache.store()
+    cached = cache.get(COUNT_KEY, COUNT_KEY)
+    if cached is not None:
+        return int(cached)
+    value = db.session.query(func.count(Product.id)).filter(flagged()).scalar()
+    cache.set(COUNT_KEY, str(value), current_app.config.get('LOW_STOCK_COUNT_TTL', 300), COUNT_KEY)
+    return value
+
+
+def alerts(vendor_id=None, limit=None):
+    """Low-stock products (with vendors), longest-low first."""
+    query = Product.query.options(joinedload(Product.vendor)).filter(flagged())
+    if vendor_id is not None:
+        query = query.filter(Product.vendor_id == vendor_id)
+    query = query.order_by(Product.low_stock_since.asc(), Product.id.asc())
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def _digest_lines(products, since):
+    lines = []
+    for p in products:
+        new = ' (new)' if p.low_stock_since and p.low_stock_since >= since else ''
+        lines.append(f'- {p.name} (#{p.id}): {p.quantity} left, threshold {p.min_quantity}{new}')
+    return lines
+
+
+def queue_digest(period=timedelta(days=1)):
+    """Queue the low-stock digest mails and commit.
+
+    Products that went low within ``period`` are marked new. Returns the
+    number of mails queued (0 when nothing is low or mail is off).
+    """
+    if not email_utils.is_configured():
+        return 0
+    products = alerts()
+    if not products:
+        return 0
+    since = datetime.utcnow() - period
+    queued = 0
+    by_vendor = {}
+    for p in products:
+        by_vendor.setdefault(p.vendor_id, []).append(p)
+    for vendor_id, items in by_vendor.items():
+        vendor = items[0].vendor
+        if vendor is None or not vendor.is_active:
+            continue
+        body = '\n'.join([f'Hello {vendor.name},', '', 'These products are at or below their low-stock threshold:', '']
+                         + _digest_lines(items, since))
+        if email_utils.queue_email(vendor.email, f'Low stock: {len(items)} product(s)', body):
+            queued += 1
+    admins = [email for (email,) in db.session.query(User.email).filter(User.role == 'admin', User.is_active == True)]
+    body = '\n'.join([f'{len(products)} product(s) are at or below their low-stock threshold:', '']
+                     + _digest_lines(products, since))
+    for email in admins:
+        if email_utils.queue_email(email, f'Low stock digest: {len(products)} product(s)', body):
+            queued += 1
+    db.session.commit()
+    return queued
@@ -0,0 +1,153 @@
+"""Order placement.
+
+``place_order`` turns a user's cart into an order in one transaction. Stock
+is taken with a conditional ``UPDATE ... WHERE quantity >= :n RETURNING
+quantity`` per product, so two buyers racing for the last unit cannot both
+win: the loser's UPDATE matches no row and the whole transaction rolls back.
+Order items and ``sale`` ledger rows are bulk-inserted and the cart is
+cleared before the single commit, so a failure never leaves an order without
+items or stock taken for a missing order. The order is added to the daily
+sales rollup (``utils.sales_rollup``) in the same transaction.
+
+Units the buyer already holds (``utils.reservations``) are converted rather
+than re-checked: the holds are deleted first and each UPDATE moves them out
+of ``reserved_quantity``, so only the unheld remainder has to be available.
+
+``reopen_order`` takes a cancelled order's items out of stock again the
+same way when an admin moves it back out of ``cancelled``.
+
+On SQLite the first statement of the transaction is the reservation DELETE,
+so the write lock is taken up front and concurrent workers queue on
+``busy_timeout`` (see ``utils.sqlite_tuning``) instead of failing.
+"""
+from sqlalchemy import func, insert, update
+
+from models import db
+from models.order_model import Cart, Order, OrderItem, Payment
+from models.product_model import Product
+from utils import email_utils, inventory, product_stats, reservations, sales_rollup
+
+
+class OutOfStock(Exception):
+    """Raised when one or more cart lines can no longer be filled."""
+
+    def __init__(self, product_names):
+        self.product_names = product_names
+        super().__init__(f"Not enough stock for: {', '.join(product_names)}")
+
+
+def cart_lines(user_id):
+    """(product_id, quantity, name) per product in the cart, by product id."""
+    return (
+        db.session.query(Cart.product_id, func.sum(Cart.quantity), Product.name)
+        .join(Product, Product.id == Cart.product_id)
+        .filter(Cart.user_id == user_id)
+        .group_by(Cart.product_id, Product.name)
+        .order_by(Cart.product_id)
+        .all()
+    )
+
+
+def place_order(user_id, shipping_address, confirm_to=None):
+    """Create an order from the user's cart and commit it.
+
+    Returns the new Order, or None if the cart is empty. Raises OutOfStock
+    (after rolling back) if any line cannot be filled. With ``confirm_to``
+    the confirmation email is queued in the same transaction.
+    """
+    lines = cart_lines(user_id)
+    if not lines:
+        return None
+    try:
+        held = reservations.take_for_checkout(user_id, {line[0] for line in lines})
+        short = []
+        remaining = {}
+        for product_id, quantity, name in lines:
+            hold = held.get(product_id, 0)
+            new_quantity = db.session.execute(
+                update(Product)
+                .where(Product.id == product_id, Product.is_active == True,
+                       Product.quantity - Product.reserved_quantity + hold >= quantity)
+                .values({
+                    Product.quantity: Product.quantity - quantity,
+                    Product.reserved_quantity: Product.reserved_quantity - hold,
+                    Product.in_stock: Product.quantity > quantity,
+                    **product_stats.sale_values(quantity),
+                })
+                .returning(Product.quantity)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+            if new_quantity is None:
+                short.append(name)
+            remaining[product_id] = new_quantity
+        if short:
+            raise OutOfStock(short)
+
+        # Prices read inside the transaction, after the rows are locked
+        ids = [line[0] for line in lines]
+        products = {row.id: row for row in db.session.query(Product.id, Product.price, Product.category_id,
+                                                            Product.vendor_id).filter(Product.id.in_(ids))}
+        total = sum(products[product_id].price * quantity for product_id, quantity, _ in lines)
+
+        order = Order(user_id=user_id, total_amount=total, status='pending', shipping_address=shipping_address)
+        db.session.add(order)
+        db.session.flush()
+        db.session.execute(insert(OrderItem), [
+            {'order_id': order.id, 'product_id': product_id, 'quantity': quantity,
+             'price': products[product_id].price, 'category_id': products[product_id].category_id,
+             'vendor_id': products[product_id].vendor_id}
+            for product_id, quantity, _ in lines
+        ])
+        sales_rollup.record_order(order)
+        inventory.append([
+            inventory.entry(product_id, 'sale', -quantity, remaining[product_id], user_id, f'Order #{order.id}')
+            for product_id, quantity, _ in lines
+        ])
+        db.session.add(Payment(order_id=order.id, amount=total, status='pending'))
+        Cart.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        if confirm_to:
+            email_utils.queue_email(confirm_to, 'Order placed', f'Your order #{order.id} was placed. Total: {total}')
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return order
+
+
+def reopen_order(order, user_id):
+    """Take a cancelled order's items out of stock again.
+
+    For a status change away from ``cancelled``: stock and units sold are
+    taken with the same conditional decrement as checkout. Raises
+    OutOfStock if a line can no longer be filled; the caller rolls back.
+    The caller commits (with the status change).
+    """
+    items = (
+        db.session.query(OrderItem.product_id, func.sum(OrderItem.quantity), Product.name)
+        .join(Product, Product.id == OrderItem.product_id)
+        .filter(OrderItem.order_id == order.id)
+        .group_by(OrderItem.product_id, Product.name)
+        .order_by(OrderItem.product_id)
+    )
+    short, entries = [], []
+    for product_id, quantity, name in items.all():
+        new_quantity = db.session.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.quantity - Product.reserved_quantity >= quantity)
+            .values({
+                Product.quantity: Product.quantity - quantity,
+                Product.in_stock: Product.quantity > quantity,
+                **product_stats.sale_values(quantity),
+            })
+            .returning(Product.quantity)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if new_quantity is None:
+            short.append(name)
+        else:
+            entries.append(inventory.entry(product_id, 'sale', -quantity, new_quantity, user_id,
+                                           f'Order #{order.id} reopened'))
+    if short:
+        raise OutOfStock(short)
+    inventory.append(entries)
+
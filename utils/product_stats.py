@@ -0,0 +1,135 @@
+"""Denormalized rating and sales counters on Product.
+
+``review_count``/``rating_sum`` and ``units_sold`` are adjusted with
+relative UPDATEs inside the caller's transaction, so catalog reads never
+have to aggregate reviews or order items. ``units_sold`` counts units in
+orders that were not cancelled: a cancellation takes them off again, in
+the same UPDATE that returns them to stock. Moderating reviews in bulk adds
+or takes away one delta per product. ``reconcile`` recomputes them from the
+source tables for the ``manage.py reconcile-stats`` command.
+"""
+from collections import defaultdict
+
+from sqlalchemy import delete, func, update
+
+from models import db
+from models.product_model import Product, Review
+from models.order_model import Order, OrderItem
+
+
+def _bump(product_id, **deltas):
+    values = {getattr(Product, name): getattr(Product, name) + delta for name, delta in deltas.items()}
+    Product.query.filter(Product.id == product_id).update(values, synchronize_session=False)
+
+
+def approve_review(review):
+    """Mark a review approved and count it towards the product rating.
+
+    Does nothing if the review is already approved. The caller commits.
+    """
+    if review.is_approved:
+        return False
+    review.is_approved = True
+    _bump(review.product_id, review_count=1, rating_sum=review.rating)
+    return True
+
+
+def unapprove_review(review):
+    """Withdraw a previously approved review from the product rating."""
+    if not review.is_approved:
+        return False
+    review.is_approved = False
+    _bump(review.product_id, review_count=-1, rating_sum=-review.rating)
+    return True
+
+
+def _bump_ratings(rows, sign):
+    """One counter UPDATE per product for (product_id, rating) rows."""
+    totals = defaultdict(lambda: [0, 0])
+    for product_id, rating in rows:
+        totals[product_id][0] += 1
+        totals[product_id][1] += rating
+    for product_id, (count, rating_sum) in totals.items():
+        _bump(product_id, review_count=sign * count, rating_sum=sign * rating_sum)
+
+
+def approve_reviews(ids):
+    """Approve the pending reviews among ``ids`` and count them in.
+
+    Returns the ids that were approved; already approved or missing ones
+    are left out. The caller commits.
+    """
+    rows = db.session.execute(
+        update(Review).where(Review.id.in_(ids), Review.is_approved == False)
+        .values(is_approved=True)
+        .returning(Review.id, Review.product_id, Review.rating)
+        .execution_options(synchronize_session=False)
+    ).all()
+    _bump_ratings([(product_id, rating) for _, product_id, rating in rows], 1)
+    return [row_id for row_id, _, _ in rows]
+
+
+def reject_reviews(ids):
+    """Delete the reviews among ``ids``; approved ones leave the rating.
+
+    Returns the ids that were deleted. The caller commits.
+    """
+    rows = db.session.execute(
+        delete(Review).where(Review.id.in_(ids))
+        .returning(Review.id, Review.product_id, Review.rating, Review.is_approved)
+        .execution_options(synchronize_session=False)
+    ).all()
+    _bump_ratings([(product_id, rating) for _, product_id, rating, approved in rows if approved], -1)
+    return [row_id for row_id, _, _, _ in rows]
+
+
+def sale_values(quantity):
+    """SET clause counting ``quantity`` sold units, for an UPDATE the caller
+    already issues on the product row (see ``utils.orders``)."""
+    return {Product.units_sold: Product.units_sold + quantity}
+
+
+def record_sale(product_id, quantity):
+    """Add sold units to the product's popularity counter."""
+    Product.query.filter(Product.id == product_id).update(sale_values(quantity), synchronize_session=False)
+
+
+def reconcile(fix=True):
+    """Recompute every product's counters from reviews and order items.
+
+    Returns a list of ``(product_id, field, stored, actual)`` tuples for each
+    counter that had drifted. When ``fix`` is true the drift is corrected in
+    the current session and committed.
+    """
+    ratings = {
+        row[0]: (int(row[1]), int(row[2] or 0))
+        for row in db.session.query(Review.product_id, func.count(Review.id), func.sum(Review.rating))
+        .filter(Review.is_approved == True).group_by(Review.product_id)
+    }
+    # cancelled orders have been returned to stock and taken off units_sold
+    sales = {
+        row[0]: int(row[1] or 0)
+        for row in db.session.query(OrderItem.product_id, func.sum(OrderItem.quantity))
+        .join(Order, Order.id == OrderItem.order_id)
+        .filter(func.coalesce(Order.status, 'pending') != 'cancelled')
+        .group_by(OrderItem.product_id)
+    }
+
+    drift = []
+    updates = []
+    stored = db.session.query(Product.id, Product.review_count, Product.rating_sum, Product.units_sold)
+    for product_id, review_count, rating_sum, units_sold in stored:
+        count, total = ratings.get(product_id, (0, 0))
+        sold = sales.get(product_id, 0)
+        actual = {'review_count': count, 'rating_sum': total, 'units_sold': sold}
+        current = {'review_count': review_count, 'rating_sum': rating_sum, 'units_sold': units_sold}
+        changed = {k: v for k, v in actual.items() if current[k] != v}
+        for field, value in changed.items():
+            drift.append((product_id, field, current[field], value))
+        if changed:
+            updates.append(dict(changed, id=product_id))
+
+    if fix and updates:
+        db.session.bulk_update_mappings(Product, updates)
+        db.session.commit()
+    return drift
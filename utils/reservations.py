@@ -0,0 +1,130 @@
+"""Time-limited stock holds for cart contents.
+
+Adding to the cart holds the units for ``RESERVATION_TTL`` seconds in
+``stock_reservations`` (one row per product and user) and bumps the
+product's ``reserved_quantity``, so available-to-promise is
+``quantity - reserved_quantity`` without summing reservations. Holds are
+taken with a conditional UPDATE, so two carts can never hold the same
+unit.
+
+A hold is changed by one UPDATE of the product that reads the old hold in
+a subquery, so its first statement takes the write lock. The sweeper (a
+background job) and checkout remove holds with ``DELETE ... RETURNING`` and
+subtract exactly what they deleted, so a hold is released or converted
+once however they interleave.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, bindparam, delete, func, insert, or_, select, update
+
+from models import db
+from models.order_model import StockReservation
+from models.product_model import Product
+
+
+def init_app(app):
+    from utils import background
+    batch = app.config.get('RESERVATION_SWEEP_BATCH', 500)
+    background.register(app, 'reservation-sweeper', app.config.get('RESERVATION_SWEEP_INTERVAL', 60),
+                        lambda: sweep(batch))
+
+
+def _take(*criteria):
+    """Delete matching holds; returns {product_id: units released}."""
+    rows = db.session.execute(
+        delete(StockReservation).where(*criteria)
+        .returning(StockReservation.product_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    taken = Counter()
+    for product_id, quantity in rows:
+        taken[product_id] += quantity
+    return taken
+
+
+def _unreserve(released):
+    """Subtract released units from each product's reserved_quantity."""
+    if not released:
+        return
+    products = Product.__table__
+    db.session.execute(
+        update(products)
+        .where(products.c.id == bindparam('pid'))
+        .values(reserved_quantity=products.c.reserved_quantity - bindparam('released')),
+        [{'pid': pid, 'released': qty} for pid, qty in released.items()],
+    )
+
+
+def held(product_id, user_id):
+    """Units of a product currently held for a user."""
+    return db.session.query(StockReservation.quantity).filter_by(
+        product_id=product_id, user_id=user_id).scalar() or 0
+
+
+def set_hold(product_id, user_id, quantity):
+    """Hold ``quantity`` units of a product for a user's cart (0 releases).
+
+    Refreshes the expiry. Returns False, leaving the old hold in place, if
+    not enough stock is available. The caller commits.
+    """
+    held = func.coalesce(
+        select(StockReservation.quantity)
+        .where(StockReservation.product_id == product_id, StockReservation.user_id == user_id)
+        .scalar_subquery(), 0)
+    # Shrinking a hold always succeeds; growing one needs the extra units free
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id == product_id,
+               or_(held >= quantity,
+                   and_(Product.is_active == True,
+                        Product.quantity - Product.reserved_quantity >= quantity - held)))
+        .values({Product.reserved_quantity: Product.reserved_quantity + quantity - held})
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return False
+    _take(StockReservation.product_id == product_id, StockReservation.user_id == user_id)
+    if quantity > 0:
+        ttl = current_app.config.get('RESERVATION_TTL', 900)
+        now = datetime.utcnow()
+        db.session.execute(insert(StockReservation), [{
+            'product_id': product_id,
+            'user_id': user_id,
+            'quantity': quantity,
+            'expires_at': now + timedelta(seconds=ttl),
+            'created_at': now,
+        }])
+    return True
+
+
+def take_for_checkout(user_id, product_ids):
+    """Remove all of a user's holds; returns {product_id: units held}.
+
+    Runs inside the checkout transaction, which moves the held units of
+    ``product_ids`` from reserved_quantity to the sale. Holds on other
+    products (lines the order no longer has) are released here.
+    """
+    taken = _take(StockReservation.user_id == user_id)
+    _unreserve({pid: qty for pid, qty in taken.items() if pid not in product_ids})
+    return {pid: qty for pid, qty in taken.items() if pid in product_ids}
+
+
+def sweep(batch_size=500):
+    """Release expired holds, ``batch_size`` rows per transaction."""
+    released_total = 0
+    while True:
+        expired = (select(StockReservation.id)
+                   .where(StockReservation.expires_at < datetime.utcnow())
+                   .limit(batch_size))
+        released = _take(StockReservation.id.in_(expired))
+        if not released:
+            db.session.rollback()
+            break
+        _unreserve(released)
+        db.session.commit()
+        batch = sum(released.values())
+        released_total += batch
+        current_app.logger.info('Released %d expired reserved unit(s)', batch)
+    return released_total
@@ -0,0 +1,179 @@
+"""Daily sales rollup in ``sales_daily``.
+
+One row per (day, status, payment_status, category, vendor) holds the
+orders, units and revenue of the order lines in that group. Rows are
+adjusted with upserts in the caller's transaction: ``record_order`` adds a
+new order's lines and ``set_status`` moves an order's lines from its old
+status key to the new one. Sales reports then sum a few hundred rollup
+rows instead of grouping every order, for any date range and broken down by
+any key column. ``rebuild`` (``manage.py rebuild-sales``) recomputes the
+table from the orders; ``remove_order`` takes out an order that is about to
+be deleted.
+
+An order with lines in several categories or vendors counts once in each
+group, so ``orders`` is only reported by category or vendor; units and
+revenue add up across groups. Lines are filed under the category and vendor
+stored on the order item at the time of sale, so later category merges or
+renames never move an order between groups. Lines without a category or
+vendor (items of products deleted before those were recorded) are filed
+under 0, here, in ``rebuild`` and in the migration that backfilled them.
+"""
+from datetime import datetime
+
+from sqlalchemy import Date, delete, func, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db
+from models.order_model import Order, OrderItem, SalesDaily
+from models.product_model import Category
+from models.user_model import User
+
+KEY = ('day', 'status', 'payment_status', 'category_id', 'vendor_id')
+MEASURES = ('orders', 'units', 'revenue')
+# ``by=`` name -> rollup column
+DIMENSIONS = {
+    'day': SalesDaily.day,
+    'status': SalesDaily.status,
+    'payment_status': SalesDaily.payment_status,
+    'category': SalesDaily.category_id,
+    'vendor': SalesDaily.vendor_id,
+}
+
+
+def _upsert(select_stmt):
+    """INSERT the selected rows, adding the measures to existing keys."""
+    insert = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    stmt = insert(SalesDaily).from_select(KEY + MEASURES, select_stmt)
+    return stmt.on_conflict_do_update(
+        index_elements=list(KEY),
+        set_={name: getattr(SalesDaily, name) + stmt.excluded[name] for name in MEASURES},
+    )
+
+
+def _order_day(order):
+    return (order.created_at or datetime.utcnow()).date()
+
+
+def _line_keys():
+    # NULL keys are filed under 0; sales_daily key columns are NOT NULL
+    return func.coalesce(OrderItem.category_id, 0), func.coalesce(OrderItem.vendor_id, 0)
+
+
+def _add(order, sign, status, payment_status):
+    """Add (sign 1) or take away (sign -1) the order's lines under one status key."""
+    category_id, vendor_id = _line_keys()
+    lines = (
+        select(literal(_order_day(order), Date), literal(status), literal(payment_status),
+               category_id, vendor_id, literal(sign),
+               sign * func.sum(OrderItem.quantity), sign * func.sum(OrderItem.quantity * OrderItem.price))
+        .where(OrderItem.order_id == order.id)
+        .group_by(category_id, vendor_id)
+    )
+    db.session.execute(_upsert(lines))
+
+
+def record_order(order):
+    """Count a newly placed (flushed, with items) order. The caller commits."""
+    _add(order, 1, order.status or 'pending', order.payment_status or 'pending')
+
+
+def set_status(order, status=None, payment_status=None):
+    """Change an order's status and/or payment status and move its rollup rows.
+
+    Returns False if nothing changed. The caller commits.
+    """
+    old = (order.status or 'pending', order.payment_status or 'pending')
+    new = (status or old[0], payment_status or old[1])
+    if new == old:
+        return False
+    _add(order, -1, *old)
+    _add(order, 1, *new)
+    order.status, order.payment_status = new
+    _prune(order)
+    return True
+
+
+def remove_order(order):
+    """Take an order out of the rollup before it (and its items) is deleted.
+
+    The caller commits.
+    """
+    _add(order, -1, order.status or 'pending', order.payment_status or 'pending')
+    _prune(order)
+
+
+def _prune(order):
+    # groups the order was the last one in
+    db.session.execute(delete(SalesDaily).where(SalesDaily.day == _order_day(order), SalesDaily.orders == 0))
+
+
+def rebuild():
+    """Recompute the whole rollup from orders and their items."""
+    keys = (func.date(Order.created_at), func.coalesce(Order.status, 'pending'),
+            func.coalesce(Order.payment_status, 'pending'), *_line_keys())
+    rows = (
+        select(*keys, func.count(func.distinct(Order.id)), func.sum(OrderItem.quantity),
+               func.sum(OrderItem.quantity * OrderItem.price))
+        .select_from(OrderItem)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.created_at.isnot(None))
+        .group_by(*keys)
+    )
+    db.session.execute(delete(SalesDaily))
+    db.session.execute(_upsert(rows))
+    db.session.commit()
+    return db.session.query(func.count(SalesDaily.id)).scalar()
+
+
+def _filtered(query, since=None, until=None, status=None, payment_status=None, category_id=None,
+              vendor_id=None):
+    if since is not None:
+        query = query.filter(SalesDaily.day >= since)
+    if until is not None:
+        query = query.filter(SalesDaily.day < until)
+    if status:
+        query = query.filter(SalesDaily.status == status)
+    if payment_status:
+        query = query.filter(SalesDaily.payment_status == payment_status)
+    if category_id is not None:
+        query = query.filter(SalesDaily.category_id == category_id)
+    if vendor_id is not None:
+        query = query.filter(SalesDaily.vendor_id == vendor_id)
+    return query
+
+
+def total(**filters):
+    """Revenue over the rollup rows matching the filters (see ``breakdown``)."""
+    query = db.session.query(func.coalesce(func.sum(SalesDaily.revenue), 0))
+    return float(_filtered(query, **filters).scalar())
+
+
+def breakdown(by='day', **filters):
+    """Units and revenue per value of one key column, as a list of dicts.
+
+    ``by`` is a ``DIMENSIONS`` name. Filters: ``since`` (inclusive) and
+    ``until`` (exclusive) dates, ``status``, ``payment_status``,
+    ``category_id`` and ``vendor_id``. Category and vendor groups also get
+    a ``name`` and their order count.
+    """
+    column = DIMENSIONS[by]
+    query = db.session.query(column, func.sum(SalesDaily.orders), func.sum(SalesDaily.units),
+                             func.sum(SalesDaily.revenue))
+    rows = _filtered(query, **filters).group_by(column).order_by(column).all()
+
+    names = {}
+    if by == 'category':
+        names = dict(db.session.query(Category.id, Category.name).filter(Category.id.in_([r[0] for r in rows])))
+        names.setdefault(0, 'Uncategorized')
+    elif by == 'vendor':
+        names = dict(db.session.query(User.id, User.name).filter(User.id.in_([r[0] for r in rows])))
+        names.setdefault(0, 'Unknown vendor')
+
+    result = []
+    for key, orders, units, revenue in rows:
+        item = {by: str(key) if by == 'day' else key, 'units': int(units or 0), 'revenue': float(revenue or 0)}
+        if by in ('category', 'vendor'):
+            item['name'] = names.get(key)
+            item['orders'] = int(orders or 0)
+        result.append(item)
+    return result
@@ -0,0 +1,197 @@
+"""Full-text product search backed by an SQLite FTS5 table.
+
+``products_fts`` indexes name, description, category and sub_category with
+the product id as rowid. The table is created by a migration (and by
+``db.create_all`` for new databases); ``manage.py rebuild-search`` refills
+it. It is kept in sync from SQLAlchemy flush events, so every ORM write to
+a Product updates the index in the same transaction.
+Queries are prefix-matched, ranked with bm25 and can return highlighted
+snippets. When the SQLite build has no FTS5 (or the database is not SQLite)
+everything falls back to the old ``ILIKE`` filter.
+"""
+import re
+import weakref
+
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import Float, Integer, Text, column, event, inspect, or_, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from models import db
+from models.product_model import Product
+
+FTS_TABLE = 'products_fts'
+INDEXED_FIELDS = ('name', 'description', 'category', 'sub_category')
+# Mapped attributes whose changes alter an index row (category is stored by name)
+TRACKED_ATTRS = ('name', 'description', 'category_id', 'category_ref', 'sub_category')
+# bm25 column weights, in INDEXED_FIELDS order: a name hit beats a description hit
+BM25_WEIGHTS = (10.0, 1.0, 4.0, 2.0)
+
+# Snippet markers; replaced with <mark> after the text has been escaped
+_HL_START = '\x02'
+_HL_END = '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Engines on which products_fts exists; flush events skip all others
+_fts_engines = weakref.WeakSet()
+
+
+_CREATE = text(
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    f"USING fts5({', '.join(INDEXED_FIELDS)}, tokenize='unicode61 remove_diacritics 2')"
+)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_table(metadata, connection, **kw):
+    if connection.dialect.name != 'sqlite':
+        return
+    try:
+        with connection.begin_nested():
+            connection.execute(_CREATE)
+    except OperationalError:  # no FTS5 in this SQLite build
+        pass
+
+
+def init_app(app):
+    """Use the FTS table if it exists.
+
+    Only looks the table up: the schema may predate the current models
+    until ``flask db upgrade`` has run, so nothing is read from them here.
+    """
+    engine = db.engine
+    exists = False
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+            ).first() is not None
+    if not exists:
+        if engine.dialect.name == 'sqlite':
+            app.logger.warning(f'{FTS_TABLE} does not exist (run flask db upgrade); product search falls back to LIKE.')
+        app.extensions['product_search'] = False
+        return
+    _fts_engines.add(engine)
+    app.extensions['product_search'] = True
+
+
+def is_available():
+    return bool(current_app.extensions.get('product_search'))
+
+
+def _row(product):
+    return {
+        'rowid': product.id,
+        'name': product.name or '',
+        'description': product.description or '',
+        'category': product.category or '',
+        'sub_category': product.sub_category or '',
+    }
+
+
+_INSERT = text(
+    f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(INDEXED_FIELDS)}) "
+    f"VALUES (:rowid, {', '.join(':' + f for f in INDEXED_FIELDS)})"
+)
+_DELETE = text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid")
+
+
+def reindex(product_ids):
+    """Re-read the given products and refresh their index rows."""
+    if not is_available() or not product_ids:
+        return
+    ids = list(product_ids)
+    db.session.execute(_DELETE, [{'rowid': pid} for pid in ids])
+    products = Product.query.filter(Product.id.in_(ids)).execution_options(populate_existing=True)
+    rows = [_row(p) for p in products]
+    if rows:
+        db.session.execute(_INSERT, rows)
+
+
+def rebuild():
+    """Drop and refill the whole index from the products table."""
+    if not is_available():
+        return 0
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    columns = [Product.id] + [getattr(Product, f).label(f) for f in INDEXED_FIELDS]
+    rows = [_row(r) for r in db.session.query(*columns)]
+    if rows:
+        db.session.execute(_INSERT, rows)
+    db.session.commit()
+    return len(rows)
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_index(session, flush_context):
+    changed = [obj for obj in session.new if isinstance(obj, Product)]
+    for obj in session.dirty:
+        if isinstance(obj, Product):
+            state = inspect(obj)
+            if any(state.attrs[attr].history.has_changes() for attr in TRACKED_ATTRS):
+                changed.append(obj)
+    removed = [obj.id for obj in session.deleted if isinstance(obj, Product)]
+    if not changed and not removed:
+        return
+    conn = session.connection()
+    if conn.engine not in _fts_engines:
+        return
+    stale = [{'rowid': obj.id} for obj in changed] + [{'rowid': pid} for pid in removed]
+    conn.execute(_DELETE, stale)
+    if changed:
+        conn.execute(_INSERT, [_row(obj) for obj in changed])
+
+
+def match_expression(q):
+    """Turn free text into an FTS5 query: every word, prefix-matched."""
+    tokens = _TOKEN_RE.findall(q or '')
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def ranked_matches(q):
+    """Subquery of (product_id, rank, snippet) for products matching ``q``.
+
+    Lower rank is more relevant (bm25 returns negated scores). Returns None
+    when FTS is unavailable or ``q`` has no searchable words.
+    """
+    expression = match_expression(q)
+    if not is_available() or expression is None:
+        return None
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    stmt = text(
+        f"SELECT rowid AS product_id, bm25({FTS_TABLE}, {weights}) AS rank, "
+        f"snippet({FTS_TABLE}, -1, :hl_start, :hl_end, '…', 16) AS snippet "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+    ).bindparams(hl_start=_HL_START, hl_end=_HL_END, match=expression)
+    return stmt.columns(
+        column('product_id', Integer),
+        column('rank', Float),
+        column('snippet', Text),
+    ).subquery('matches')
+
+
+def filter_query(query, q, fields=('name', 'description')):
+    """Restrict a Product query to matches for ``q``, without ranking.
+
+    Uses the FTS index when available and the LIKE filter on ``fields``
+    otherwise.
+    """
+    if not q:
+        return query
+    expression = match_expression(q)
+    if is_available() and expression is not None:
+        ids = text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match").bindparams(match=expression)
+        return query.filter(Product.id.in_(ids.columns(column('rowid', Integer))))
+    clauses = [getattr(Product, f).ilike(f"%{q}%") for f in fields]
+    return query.filter(or_(*clauses))
+
+
+def highlight(snippet):
+    """Escape a snippet and turn its match markers into <mark> tags."""
+    if not snippet:
+        return Markup('')
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(_HL_START, '<mark>').replace(_HL_END, '</mark>'))
@@ -0,0 +1,27 @@
+"""Connection settings for SQLite under concurrent workers.
+
+WAL lets readers run alongside the single writer, and ``busy_timeout``
+makes a writer wait for the lock instead of failing at once with
+"database is locked". ``synchronous=NORMAL`` is the usual pairing with
+WAL: durable across application crashes, one fsync per checkpoint.
+"""
+from sqlalchemy import event
+
+from models import db
+
+
+def init_app(app):
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    busy_timeout = int(app.config.get('SQLITE_BUSY_TIMEOUT', 15000))
+    wal = app.config.get('SQLITE_WAL', True)
+
+    @event.listens_for(engine, 'connect')
+    def _configure(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout = {busy_timeout}')
+        if wal:
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.close()